@@ -1,11 +1,10 @@
 from flask import Flask, render_template, request, jsonify, send_file
-import pandas as pd
 import joblib
 import numpy as np
 import io
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
-from datetime import datetime
+from datetime import datetime, timedelta
 import torch
 import mlflow
 import threading
@@ -13,6 +12,13 @@ import time
 import os
 import logging
 import random
+import subprocess
+import sys
+import warnings
+
+from serving.schema import FEATURE_NAMES, TransactionSchema, SchemaError, dumps as dump_json
+from serving.degradation import DegradationController
+from reporting.rollups import RollupStore, RANGES as STATS_RANGES
 
 # Try to import optional modules, create dummy classes if not available
 try:
@@ -27,9 +33,43 @@ except ImportError:
     class TransactionGraphBuilder:
         def __init__(self):
             pass
+        def add_edges(self, data):
+            return None
+        def to_data(self, account_index):
+            return None
         def add_transaction(self, data):
             return None
 
+try:
+    from graph_models.analytics import GraphAnalytics
+except ImportError:
+    GraphAnalytics = None
+
+try:
+    from serving.shadow import ShadowScorer, ModelCandidate, EnsembleCandidate, SHADOW_LOG_SCHEMA
+except ImportError:
+    ShadowScorer = None
+
+try:
+    from serving.cascade import CascadeScorer, FirstStageTree
+except ImportError:
+    CascadeScorer = None
+
+try:
+    from serving.entity_lists import EntityListFilter
+except ImportError:
+    EntityListFilter = None
+
+try:
+    from storage.columnar import ColumnarSegmentWriter
+except ImportError:
+    ColumnarSegmentWriter = None
+
+try:
+    from storage.event_log import ScoredEventLog
+except ImportError:
+    ScoredEventLog = None
+
 try:
     from reporting.generator import ReportGenerator
 except ImportError:
@@ -43,7 +83,9 @@ except ImportError:
     class CustomerRiskProfiler:
         def __init__(self):
             pass
-        def update_profile(self, account_id, data):
+        def update_profile(self, account_id, data, persist=True):
+            pass
+        def flush(self):
             pass
         def get_risk_profile(self, account_id):
             return {'risk_score': 0.5, 'avg_amount': 150.0, 'std_amount': 75.0, 'max_amount': 1000.0, 'avg_duration': 120.0, 'unique_locations': 3}
@@ -61,15 +103,23 @@ try:
     from models.automl.trainer import AutoMLTrainer
 except ImportError:
     class AutoMLTrainer:
-        def __init__(self, data_path):
+        def __init__(self, data_path, **kwargs):
             self.data_path = data_path
         def train_models(self):
-            # Return dummy model and score
-            return None, 0.8
+            return {'status': 'unavailable'}
+        def report(self):
+            return None
+        def promote(self):
+            raise ValueError("AutoML trainer not available")
+        def explainer_stale(self):
+            return False
 
 TRANSACTIONS = []
 import random
 
+# Dashboard counters per minute/hour/day, fed by every scored transaction
+rollups = RollupStore()
+
 def generate_dummy_transaction():
     return {
         "TransactionID": f"TX{random.randint(100000, 999999)}",
@@ -111,26 +161,53 @@ app = Flask(__name__)
 
 # Initialize components with error handling
 try:
-    iso_forest = joblib.load('models/isolation_forest.pkl')
+    from models.artifact_store import ModelArtifactStore
+    artifact_store = ModelArtifactStore(os.environ.get('MODEL_STORE_DIR', 'models/store'))
+except ImportError:
+    artifact_store = None
+
+# Artifacts that exist but failed to load (checksum mismatch, bad format), shown in /health
+artifact_errors = {}
+
+def load_served_model(name, fallback):
+    """Prefer the shared memory-mapped artifact, fall back to the private pickle"""
+    if artifact_store is not None and artifact_store.has(name):
+        try:
+            model = artifact_store.load(name)
+            artifact_errors.pop(name, None)
+            return model
+        except Exception as e:
+            logger.warning(f"Mmap artifact for {name} failed to load ({e}), using fallback loader")
+            artifact_errors[name] = str(e)
+    elif artifact_store is not None:
+        logger.info(f"No mmap artifact for {name}, using fallback loader")
+    return fallback()
+
+try:
+    iso_forest = load_served_model('isolation_forest', lambda: joblib.load('models/isolation_forest.pkl'))
 except FileNotFoundError:
     logger.warning("Isolation Forest model not found. Creating dummy model.")
     iso_forest = None
 
 try:
-    xgb = joblib.load('models/xgboost.pkl')
+    xgb = load_served_model('xgboost', lambda: joblib.load('models/xgboost.pkl'))
 except FileNotFoundError:
     print("Warning: XGBoost model not found. Creating dummy model.")
     xgb = None
 
 # Load SHAP explainer if available (optional)
 try:
-    shap_explainer = joblib.load('models/shap_explainer.pkl')
+    shap_explainer = load_served_model('shap_explainer', lambda: joblib.load('models/shap_explainer.pkl'))
 except FileNotFoundError:
     shap_explainer = None
     print("SHAP explainer not found. Continuing without explainability.")
+if shap_explainer is not None and AutoMLTrainer("data/bank_transactions_data_2.csv").explainer_stale():
+    # Built for an XGBoost that has since been replaced by a promoted retrain
+    logger.warning("SHAP explainer is stale for the promoted XGBoost; continuing without explainability")
+    shap_explainer = None
 
 try:
-    gnn_model = load_gnn_model('models/gnn_model.pt')
+    gnn_model = load_served_model('gnn', lambda: load_gnn_model('models/gnn_model.pt'))
 except Exception as e:
     print(f"Warning: GNN model not found or failed to load: {e}")
     gnn_model = None
@@ -141,26 +218,137 @@ except Exception as e:
     print(f"Warning: Graph builder failed to initialize: {e}")
     graph_builder = None
 
+graph_analytics = GraphAnalytics() if GraphAnalytics is not None else None
+
+# Shadow scoring of candidate models on sampled live traffic
+shadow_scorer = None
+if ShadowScorer is not None:
+    shadow_log = None
+    if ColumnarSegmentWriter is not None:
+        shadow_log = ColumnarSegmentWriter('data/shadow_log', SHADOW_LOG_SCHEMA, prefix='shadow')
+    shadow_scorer = ShadowScorer(
+        sample_rate=float(os.environ.get('SHADOW_SAMPLE_RATE', 0.1)),
+        log_writer=shadow_log
+    )
+
+# Tiered cascade: cheap first stage, full ensemble only for the uncertainty band
+CASCADE_ENABLED = os.environ.get('CASCADE_ENABLED', '0') == '1'
+CASCADE_MODEL_PATH = 'models/cascade_first_stage.json'
+cascade_scorer = None
+if CascadeScorer is not None:
+    first_stage = None
+    if os.path.exists(CASCADE_MODEL_PATH):
+        first_stage = FirstStageTree.load(CASCADE_MODEL_PATH)
+        if first_stage.target != 'base_score':
+            # Older trees learned the composite score, multiplier included; redistill them
+            logger.warning(f"Ignoring {CASCADE_MODEL_PATH}: distilled on {first_stage.target}, not base_score")
+            first_stage = None
+    cascade_scorer = CascadeScorer(
+        first_stage,
+        low=float(os.environ.get('CASCADE_LOW', 0.3)),
+        high=float(os.environ.get('CASCADE_HIGH', 0.9)),
+        audit_rate=float(os.environ.get('CASCADE_AUDIT_RATE', 0.02))
+    )
+
+# Block/allow lists checked before any model runs, reloaded when the file changes
+ENTITY_LISTS_PATH = os.environ.get('ENTITY_LISTS_PATH', 'data/entity_lists.csv')
+entity_lists = None
+if EntityListFilter is not None:
+    entity_lists = EntityListFilter(ENTITY_LISTS_PATH)
+    if os.path.exists(ENTITY_LISTS_PATH):
+        try:
+            entity_lists.reload()
+        except Exception as e:
+            logger.error(f"Failed to load entity lists from {ENTITY_LISTS_PATH}: {e}")
+    entity_lists.start_watcher()
+
+# Sheds SHAP, GNN, drift sampling, the profile rewrite and then Isolation Forest,
+# in that order, when /api/analyze breaks its latency SLO; stages come back once load drops
+def on_stage_restored(stage):
+    # Profile updates made while the rewrite was shed are only in memory until now
+    if stage == 'profile_write':
+        profiler.flush()
+
+degradation = DegradationController(
+    slo_ms=float(os.environ.get('ANALYZE_SLO_MS', 250)),
+    max_inflight=int(os.environ.get('ANALYZE_MAX_INFLIGHT', 32)),
+    enabled=os.environ.get('DEGRADATION_ENABLED', '1') == '1',
+    on_restore=on_stage_restored
+)
+
+# Persistent log of every scored transaction
+event_log = ScoredEventLog('data/events') if ScoredEventLog is not None else None
+
+# Rebuild the dashboard rollups from what was scored before this restart
+if event_log is not None:
+    try:
+        history = event_log.scan_scored_since(
+            datetime.now() - timedelta(days=31),
+            ['ScoredAt', 'TransactionAmount', 'RiskScore', 'Status']
+        )
+        rollups.backfill(history['ScoredAt'], history['TransactionAmount'],
+                         history['RiskScore'], history['Status'])
+    except Exception as e:
+        logger.error(f"Failed to backfill rollups from the event log: {e}")
+
 report_generator = ReportGenerator()
 profiler = CustomerRiskProfiler()
 drift_detector = ConceptDriftDetector()
 
 # Feature names
-features = ['TransactionAmount', 'TransactionDuration', 'LoginAttempts', 
-            'AccountBalance', 'DaysSinceLastTransaction', 'TransactionSpeed',
-            'AvgAmount', 'StdAmount', 'MaxAmount', 'AvgDuration', 'UniqueLocations',
-            'AmountDeviation', 'DurationDeviation', 'TransactionType', 
-            'Location', 'DeviceID', 'MerchantID', 'Channel', 'CustomerOccupation']
+features = FEATURE_NAMES
+
+# Compiled once: validates payloads and fills the float64 feature row directly
+transaction_schema = TransactionSchema(features)
+
+def json_response(payload, status=200):
+    return app.response_class(dump_json(payload), status=status, mimetype='application/json')
+
+RETRAIN_DATA_PATH = "data/bank_transactions_data_2.csv"
+retrain_job = {'running': False, 'started_at': None, 'finished_at': None, 'error': None, 'shadow_candidates': []}
+retrain_lock = threading.Lock()
+
+def retrained_candidate_name(path):
+    return f"retrained-{os.path.splitext(os.path.basename(path))[0]}"
+
+def run_retraining():
+    """Train in a fresh interpreter, so the trial pool never forks this multithreaded server"""
+    try:
+        result = subprocess.run([sys.executable, '-m', 'models.automl.trainer', RETRAIN_DATA_PATH],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else
+                               f"trainer exited with {result.returncode}")
+        report = AutoMLTrainer(RETRAIN_DATA_PATH).report() or {}
+        
+        # Evaluate the retrained models in shadow before they can replace the served ones
+        shadow_candidates = []
+        if shadow_scorer is not None and report.get('status') == 'success':
+            for kind, path in report['candidates'].items():
+                name = retrained_candidate_name(path)
+                shadow_scorer.register(ModelCandidate(name, joblib.load(path), kind))
+                shadow_candidates.append(name)
+        retrain_job.update(error=None, shadow_candidates=shadow_candidates)
+        app.logger.info(f"AutoML run report: {report}")
+    except Exception as e:
+        retrain_job['error'] = str(e)
+        app.logger.error(f"AutoML retraining failed: {str(e)}")
+    finally:
+        retrain_job.update(running=False, finished_at=datetime.now().isoformat())
+
+def start_retraining():
+    """Start a retraining run in the background; False if one is already running"""
+    with retrain_lock:
+        if retrain_job['running']:
+            return False
+        retrain_job.update(running=True, started_at=datetime.now().isoformat(), finished_at=None)
+    threading.Thread(target=run_retraining, daemon=True).start()
+    return True
 
 # Background tasks - disabled for Hugging Face deployment
 def auto_retrain():
     while True:
-        try:
-            trainer = AutoMLTrainer("data/bank_transactions_data_2.csv")
-            best_model, score = trainer.train_models()
-            app.logger.info(f"AutoML retraining completed. Best model: {type(best_model).__name__} with score: {score:.4f}")
-        except Exception as e:
-            app.logger.error(f"AutoML retraining failed: {str(e)}")
+        start_retraining()
         time.sleep(7 * 24 * 60 * 60)  # Run weekly
 
 # Skip background thread for Hugging Face deployment
@@ -204,14 +392,16 @@ def dashboard():
 def health_check():
     """Health check endpoint for Hugging Face"""
     return jsonify({
-        'status': 'healthy',
+        'status': 'degraded' if artifact_errors else 'healthy',
         'timestamp': datetime.now().isoformat(),
         'models_loaded': {
             'isolation_forest': iso_forest is not None,
             'xgboost': xgb is not None,
             'gnn': gnn_model is not None,
             'shap_explainer': shap_explainer is not None
-        }
+        },
+        'artifacts': artifact_store.describe() if artifact_store is not None else None,
+        'artifact_errors': artifact_errors
     })
 
 @app.route('/about')
@@ -301,146 +491,315 @@ def about():
     </html>
     """
 
-@app.route('/api/analyze', methods=['POST'])
-def analyze_transaction():
-    data = request.json
-    
-    # Update customer profile
-    profiler.update_profile(data['AccountID'], {
-        'amount': float(data['TransactionAmount']),
-        'type': data['TransactionType'],
-        'date': data['TransactionDate']
-    })
-    
-    # Get customer stats
-    cust_profile = profiler.get_risk_profile(data['AccountID'])
-    cust_stats = {
-        'AvgAmount': cust_profile.get('avg_amount', 150.0),
-        'StdAmount': cust_profile.get('std_amount', 75.0),
-        'MaxAmount': cust_profile.get('max_amount', 1000.0),
-        'AvgDuration': cust_profile.get('avg_duration', 120.0),
-        'UniqueLocations': cust_profile.get('unique_locations', 3)
-    }
-    
-    # Create feature vector
-    transaction_date = datetime.strptime(data['TransactionDate'], '%Y-%m-%d %H:%M:%S')
-    prev_date = datetime.strptime(data['PreviousTransactionDate'], '%Y-%m-%d %H:%M:%S')
-    
-    features_dict = {
-        'TransactionAmount': float(data['TransactionAmount']),
-        'TransactionDuration': float(data['TransactionDuration']),
-        'LoginAttempts': int(data['LoginAttempts']),
-        'AccountBalance': float(data['AccountBalance']),
-        'DaysSinceLastTransaction': (datetime.now() - prev_date).days,
-        'TransactionSpeed': float(data['TransactionAmount']) / float(data['TransactionDuration']),
-        'AvgAmount': cust_stats['AvgAmount'],
-        'StdAmount': cust_stats['StdAmount'],
-        'MaxAmount': cust_stats['MaxAmount'],
-        'AvgDuration': cust_stats['AvgDuration'],
-        'UniqueLocations': cust_stats['UniqueLocations'],
-        'AmountDeviation': (float(data['TransactionAmount']) - cust_stats['AvgAmount']) / cust_stats['StdAmount'],
-        'DurationDeviation': (float(data['TransactionDuration']) - cust_stats['AvgDuration']) / cust_stats['AvgDuration'],
-        'TransactionType': 0 if data['TransactionType'] == 'Debit' else 1,
-        'Location': hash(data['Location']) % 100,
-        'DeviceID': hash(data['DeviceID']) % 100,
-        'MerchantID': hash(data['MerchantID']) % 100,
-        'Channel': {'ATM': 0, 'Online': 1, 'Branch': 2}.get(data['Channel'], 0),
-        'CustomerOccupation': {'Student': 0, 'Doctor': 1, 'Engineer': 2, 'Retired': 3}.get(data['CustomerOccupation'], 0)
-    }
-    
-    # Convert to DataFrame for prediction
-    X = pd.DataFrame([features_dict], columns=features)
-    
-    # Check for concept drift
-    drift_detector.add_data(X.values[0])
-    
+def score_full_ensemble(data, X, cust_risk, plan, graph_account=None):
+    """Run IF, XGBoost, GNN and SHAP for one transaction, minus any stages the plan sheds.
+
+    The transaction is already in the graph; ``graph_account`` is its account node.
+    """
     # Get predictions with error handling
-    iso_score = 0.5
+    iso_score = 0.5 if plan.runs('ensemble') else None
     xgb_prob = 0.5
-    gnn_prob = 0.5
+    gnn_prob = 0.5 if plan.runs('gnn') else None
     
-    if iso_forest is not None:
+    if iso_forest is not None and iso_score is not None:
         try:
-            iso_score = -iso_forest.decision_function(X)[0]
+            with plan.stage('ensemble'), warnings.catch_warnings():
+                # Fitted on a DataFrame but scored on the raw feature row
+                warnings.filterwarnings('ignore', message='X does not have valid feature names')
+                iso_score = -iso_forest.decision_function(X)[0]
         except Exception as e:
             print(f"Isolation Forest prediction failed: {e}")
             iso_score = 0.5
     
     if xgb is not None:
         try:
-            xgb_prob = xgb.predict_proba(X)[0, 1]
+            with warnings.catch_warnings():
+                warnings.filterwarnings('ignore', message='X does not have valid feature names')
+                xgb_prob = xgb.predict_proba(X)[0, 1]
         except Exception as e:
             print(f"XGBoost prediction failed: {e}")
             xgb_prob = 0.5
     
     # GNN prediction
-    if gnn_model is not None and graph_builder is not None:
+    if gnn_model is not None and graph_account is not None and gnn_prob is not None:
         try:
-            graph_data = graph_builder.add_transaction(data)
-            with torch.no_grad():
-                gnn_prob = gnn_model(graph_data.x, graph_data.edge_index).item()
+            with plan.stage('gnn'):
+                graph_data = graph_builder.to_data(graph_account)
+                with torch.no_grad():
+                    # Score the transaction's account node, as the model is trained per node
+                    node_probs = gnn_model.node_probabilities(graph_data.x, graph_data.edge_index)
+                    gnn_prob = node_probs[graph_data.account_index].item()
         except Exception as e:
             print(f"GNN prediction failed: {e}")
             gnn_prob = 0.5
     
-    explanation = []
-    
     # --- SHAP explanations ---
     explanation = []
     
-    if shap_explainer is not None:
-        shap_values = shap_explainer.shap_values(X)
+    if shap_explainer is not None and plan.runs('shap'):
+        with plan.stage('shap'):
+            shap_values = shap_explainer.shap_values(X)
         for i, feature in enumerate(features):
             explanation.append({
                 'feature': feature,
-                'value': X.iloc[0, i],
+                'value': X[0, i],
                 'shap_value': shap_values[0][i]
             })
     
     # Sort explanation (works even if empty)
     explanation.sort(key=lambda x: abs(x['shap_value']), reverse=True)
     
-    # Composite score weighted by customer risk profile
-    cust_risk = cust_profile['risk_score'] if cust_profile else 0.5
-    composite_score = (
-        iso_score * 0.4 +
-        xgb_prob * 0.4 +
-        gnn_prob * 0.2
-    ) * (0.5 + cust_risk)
+    # Composite score weighted by customer risk profile; the weights of shed
+    # models are spread over the ones that ran
+    components = [(iso_score, 0.4), (xgb_prob, 0.4), (gnn_prob, 0.2)]
+    ran = [(score, weight) for score, weight in components if score is not None]
+    base_score = sum(score * weight for score, weight in ran) / sum(weight for _, weight in ran)
+    composite_score = base_score * (0.5 + cust_risk)
     
-    return jsonify({
-        'isolation_forest_score': float(iso_score),
+    return {
+        'isolation_forest_score': None if iso_score is None else float(iso_score),
         'xgboost_probability': float(xgb_prob),
-        'gnn_probability': float(gnn_prob),
+        'gnn_probability': None if gnn_prob is None else float(gnn_prob),
+        'base_score': float(base_score),
         'composite_score': float(composite_score),
+        'explanation': explanation
+    }
+
+@app.route('/api/analyze', methods=['POST'])
+def analyze_transaction():
+    payload = request.get_json(silent=True)
+    try:
+        parsed = transaction_schema.parse(payload)
+    except SchemaError as e:
+        return json_response({'error': e.message, 'field': e.field}, 400)
+    # Downstream consumers (graph, logs, shadow) see canonical, validated values
+    data = {**payload, **parsed}
+    
+    # Listed accounts, devices and merchants get a fixed decision without scoring
+    decision = entity_lists.check(parsed) if entity_lists is not None else None
+    if decision is not None:
+        return json_response(listed_decision(data, decision))
+    
+    with degradation.request() as plan:
+        return json_response(score_transaction(data, parsed, plan))
+
+def record_scored(data, scores, status):
+    """Append to the event log and bump the dashboard rollups"""
+    if event_log is not None:
+        event_log.append_scored(data, scores, status)
+    rollups.record(data['TransactionAmount'], scores['composite_score'], status == 'Flagged')
+
+def listed_decision(data, decision):
+    """Response for a transaction settled by the block/allow lists"""
+    scores = {
+        'isolation_forest_score': None,
+        'xgboost_probability': None,
+        'gnn_probability': None,
+        'composite_score': decision['score']
+    }
+    record_scored(data, scores, 'Flagged' if decision['list'] == 'block' else 'Approved')
+    cust_profile = profiler.get_risk_profile(data['AccountID']) or {}
+    return {
+        **scores,
+        'customer_risk_score': cust_profile.get('risk_score'),
+        'explanation': [],
+        'graph_features': {},
+        'cascade': None,
+        'skipped_stages': [],
+        'decision': {key: decision[key] for key in ('list', 'entity', 'status', 'reason_code')},
+        'drift_detected': drift_detector.drift_count > 0
+    }
+
+def score_transaction(data, parsed, plan):
+    """Score one validated transaction, running only the stages the plan allows"""
+    # Update customer profile; the JSON rewrite is deferred when shed
+    profile_update = {
+        'amount': parsed['TransactionAmount'],
+        'type': parsed['TransactionType'],
+        'date': parsed['TransactionDate'].strftime('%Y-%m-%d %H:%M:%S')
+    }
+    if plan.runs('profile_write'):
+        with plan.stage('profile_write'):
+            profiler.update_profile(parsed['AccountID'], profile_update)
+    else:
+        profiler.update_profile(parsed['AccountID'], profile_update, persist=False)
+    
+    # Get customer stats
+    cust_profile = profiler.get_risk_profile(parsed['AccountID']) or {}
+    cust_stats = {
+        'AvgAmount': cust_profile.get('avg_amount', 150.0),
+        'StdAmount': cust_profile.get('std_amount', 75.0),
+        'MaxAmount': cust_profile.get('max_amount', 1000.0),
+        'AvgDuration': cust_profile.get('avg_duration', 120.0),
+        'UniqueLocations': cust_profile.get('unique_locations', 3)
+    }
+    
+    # Single-row feature matrix, no per-request DataFrame
+    X = transaction_schema.feature_row(parsed, cust_stats).reshape(1, -1)
+    
+    # Check for concept drift
+    if plan.runs('drift'):
+        with plan.stage('drift'):
+            drift_detector.add_data(X[0])
+    
+    # Incremental fraud-ring features (shared devices, ring size, 2-hop reach)
+    graph_features = {}
+    if graph_analytics is not None:
+        graph_analytics.add_transaction(data)
+        graph_features = graph_analytics.get_features(
+            data['AccountID'], data.get('DeviceID'), data.get('MerchantID')
+        )
+    
+    cust_risk = cust_profile.get('risk_score', 0.5)
+    
+    # Keep the graph complete for every transaction, whichever tier scores it and
+    # even while the GNN is shed; only the forward pass is expensive
+    graph_account = None
+    if graph_builder is not None and gnn_model is not None:
+        graph_account = graph_builder.add_edges(data)
+    
+    # Cascade: the first stage settles clear cases, the gray zone goes to the full ensemble
+    tier, first_stage_score, audit = 'escalated', None, False
+    first_stage_model = cascade_scorer.first_stage if cascade_scorer is not None else None
+    if not plan.runs('ensemble') and first_stage_model is not None:
+        # Deepest degradation level: answer from the distilled tree alone
+        tier, first_stage_score = 'degraded', first_stage_model.score(X[0]) * (0.5 + cust_risk)
+    elif cascade_scorer is not None and CASCADE_ENABLED:
+        # The tree predicts the base score; the customer-risk multiplier is applied here
+        tier, first_stage_score, audit = cascade_scorer.route(X[0], multiplier=0.5 + cust_risk)
+    
+    if tier == 'escalated' or audit:
+        full = score_full_ensemble(data, X, cust_risk, plan, graph_account)
+        # Scores from a degraded ensemble would skew distillation and shadow comparisons
+        complete = plan.runs('gnn') and plan.runs('ensemble')
+        if cascade_scorer is not None and complete:
+            cascade_scorer.record_full(X[0], tier, first_stage_score, full['composite_score'],
+                                       target=full['base_score'])
+        
+        # Hand off to shadow candidates; this only samples and enqueues
+        if shadow_scorer is not None and complete:
+            shadow_scorer.submit(data, {
+                'X': X,
+                # Only the account node: a GNN candidate reads the shared graph itself
+                'graph_account': graph_account if shadow_scorer.has_kind('gnn') else None,
+                'components': {
+                    'isolation_forest': full['isolation_forest_score'],
+                    'xgboost': full['xgboost_probability'],
+                    'gnn': full['gnn_probability'],
+                    'customer_risk': float(cust_risk)
+                }
+            }, full['composite_score'])
+    
+    if tier == 'escalated':
+        scores = {key: full[key] for key in (
+            'isolation_forest_score', 'xgboost_probability', 'gnn_probability', 'composite_score'
+        )}
+        explanation = full['explanation']
+    else:
+        # Settled by the first stage; audited transactions still answer with the cascade
+        # decision so the audit never changes what a caller sees
+        scores = {
+            'isolation_forest_score': None,
+            'xgboost_probability': None,
+            'gnn_probability': None,
+            'composite_score': float(first_stage_score)
+        }
+        explanation = []
+    
+    composite_score = scores['composite_score']
+    record_scored(data, scores, 'Flagged' if composite_score > 0.7 else 'Approved')
+    
+    return {
+        **scores,
         'customer_risk_score': float(cust_risk),
         'explanation': explanation[:5],
+        'graph_features': graph_features,
+        'cascade': {'tier': tier, 'first_stage_score': first_stage_score},
+        'skipped_stages': list(plan.skipped),
         'drift_detected': drift_detector.drift_count > 0
-    })
-
+    }
 
-from datetime import timedelta
 
 @app.route('/api/transactions')
 def get_recent_transactions():
     days = request.args.get('days', default=1, type=int)
+    account_id = request.args.get('account_id')
+    limit = request.args.get('limit', default=500, type=int)
     cutoff = datetime.now() - timedelta(days=days)
 
     filtered = [
         t for t in TRANSACTIONS
         if datetime.strptime(
             t['TransactionDate'], "%Y-%m-%d %H:%M:%S"
-        ) >= cutoff
+        ) >= cutoff and (account_id is None or t['AccountID'] == account_id)
     ]
 
+    if event_log is not None:
+        scored = event_log.query(start=cutoff, account_id=account_id, limit=limit)
+        filtered = sorted(
+            scored + filtered, key=lambda t: t['TransactionDate'], reverse=True
+        )[:limit]
+
     return jsonify(filtered)
 
 
+@app.route('/api/stats')
+def get_stats():
+    range_name = request.args.get('range', '24h')
+    if range_name not in STATS_RANGES:
+        return json_response({"error": f"range must be one of {', '.join(STATS_RANGES)}"}, 400)
+    return json_response(rollups.stats(range_name))
+
+
+@app.route('/api/reports/daily-summary')
+def get_daily_summary():
+    if event_log is None:
+        return jsonify({"error": "Scored event log not available"}), 503
+    date_str = request.args.get('date', datetime.now().strftime("%Y-%m-%d"))
+    try:
+        start = datetime.strptime(date_str, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({"error": "date must be YYYY-MM-DD"}), 400
+    end = start + timedelta(days=1) - timedelta(microseconds=1)
+    return jsonify({"date": date_str, **event_log.summarize(start, end)})
+
+
 
 @app.route('/api/reports/sar', methods=['POST'])
 def generate_sar():
-    payload = request.json
-    transactions = payload.get("transactions", TRANSACTIONS)
+    payload = request.json or {}
+    transactions = payload.get("transactions")
+    if transactions is None:
+        # Select the rows server-side from an account / time range / minimum risk
+        try:
+            start = datetime.strptime(payload['start'], "%Y-%m-%d %H:%M:%S") if payload.get('start') else None
+            end = datetime.strptime(payload['end'], "%Y-%m-%d %H:%M:%S") if payload.get('end') else None
+        except (TypeError, ValueError):
+            return jsonify({"error": "start/end must be YYYY-MM-DD HH:MM:SS"}), 400
+        min_risk = payload.get('min_risk', 0.7)
+        try:
+            if isinstance(min_risk, bool):
+                raise ValueError(min_risk)
+            min_risk = float(min_risk)
+        except (TypeError, ValueError):
+            return jsonify({"error": "min_risk must be a number"}), 400
+        if not 0.0 <= min_risk <= 1.0:
+            return jsonify({"error": "min_risk must be between 0 and 1"}), 400
+        account_id = payload.get('account_id')
+
+        # Same sources as /api/transactions: the in-memory feed plus the event log
+        transactions = [
+            t for t in TRANSACTIONS
+            if t['RiskScore'] >= min_risk
+            and (account_id is None or t['AccountID'] == account_id)
+            and (start is None or datetime.strptime(t['TransactionDate'], "%Y-%m-%d %H:%M:%S") >= start)
+            and (end is None or datetime.strptime(t['TransactionDate'], "%Y-%m-%d %H:%M:%S") <= end)
+        ]
+        if event_log is not None:
+            transactions = sorted(
+                event_log.query(start=start, end=end, account_id=account_id, min_risk=min_risk) + transactions,
+                key=lambda t: t['TransactionDate'], reverse=True
+            )
 
     buffer = io.BytesIO()
     pdf = canvas.Canvas(buffer, pagesize=A4)
@@ -478,18 +837,155 @@ def get_customer_profile(customer_id):
         return jsonify(profile)
     return jsonify({"error": "Customer not found"}), 404
 
+@app.route('/api/graph/<account_id>')
+def get_graph_features(account_id):
+    if graph_analytics is None or not graph_analytics.knows_account(account_id):
+        return jsonify({"error": "Account not found in transaction graph"}), 404
+    response = {"account_id": account_id, **graph_analytics.get_features(account_id)}
+    # ?compare=AC00002,AC00003 adds the Jaccard overlap of the devices/merchants each account uses
+    compare = [other for other in request.args.get('compare', '').split(',') if other]
+    if compare:
+        response['overlap'] = {other: round(graph_analytics.account_overlap(account_id, other), 3)
+                               for other in compare}
+    return jsonify(response)
+
 @app.route('/api/models/retrain', methods=['POST'])
 def trigger_retraining():
+    if not start_retraining():
+        return jsonify({"status": "running", "started_at": retrain_job['started_at']}), 409
+    return jsonify({"status": "started", "started_at": retrain_job['started_at']}), 202
+
+@app.route('/api/models/retrain', methods=['GET'])
+def get_retraining_status():
+    # The report's own status is 'success' or 'skipped' (too few new rows)
+    return jsonify({**retrain_job, "report": AutoMLTrainer(RETRAIN_DATA_PATH).report()})
+
+@app.route('/api/models/promote', methods=['POST'])
+def promote_retrained_models():
+    global iso_forest, xgb, shap_explainer
+    if retrain_job['running']:
+        return jsonify({"error": "Retraining is still running"}), 409
+    store_dir = artifact_store.store_dir if artifact_store is not None else None
     try:
-        trainer = AutoMLTrainer("data/bank_transactions_data_2.csv")
-        best_model, score = trainer.train_models()
-        return jsonify({
-            "status": "success",
-            "best_model": type(best_model).__name__,
-            "score": score
-        })
+        result = AutoMLTrainer(RETRAIN_DATA_PATH, store_dir=store_dir).promote()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
+    
+    # Swap this worker's models; other workers pick them up on restart
+    models = result['models']
+    if 'isolation_forest' in models:
+        iso_forest = load_served_model('isolation_forest', lambda: joblib.load(models['isolation_forest']))
+    if 'xgboost' in models:
+        xgb = load_served_model('xgboost', lambda: joblib.load(models['xgboost']))
+        if result['shap_explainer'] is not None:
+            shap_explainer = load_served_model('shap_explainer', lambda: joblib.load(result['shap_explainer']))
+        else:
+            logger.warning("SHAP explainer not rebuilt for the promoted XGBoost; explanations disabled")
+            shap_explainer = None
+    
+    # The promoted candidates are now the primary, so shadowing them would compare them with themselves
+    removed = []
+    if shadow_scorer is not None:
+        for path in result['candidates'].values():
+            shadow_scorer.remove(retrained_candidate_name(path))
+            removed.append(retrained_candidate_name(path))
+    return jsonify({"status": "promoted", "models": models, "shap_explainer": result['shap_explainer'],
+                    "removed_shadow_candidates": removed})
+
+@app.route('/api/shadow/report')
+def get_shadow_report():
+    if shadow_scorer is None:
+        return jsonify({"error": "Shadow scoring not available"}), 503
+    return jsonify(shadow_scorer.report())
+
+@app.route('/api/shadow/candidates', methods=['POST'])
+def add_shadow_candidate():
+    if shadow_scorer is None:
+        return jsonify({"error": "Shadow scoring not available"}), 503
+    payload = request.json or {}
+    name = payload.get('name')
+    weights = payload.get('weights')
+    gnn_path = payload.get('gnn_path')
+    if not name or (not isinstance(weights, dict) and not isinstance(gnn_path, str)):
+        return jsonify({"error": "name and either weights or gnn_path are required"}), 400
+    if isinstance(weights, dict):
+        shadow_scorer.register(EnsembleCandidate(name, weights))
+        return jsonify({"status": "registered", "candidate": name})
+    
+    # GNN weights saved by graph_models/train_gnn.py, read only from the models directory
+    path = os.path.realpath(gnn_path)
+    if not path.startswith(os.path.realpath('models') + os.sep) or not os.path.isfile(path):
+        return jsonify({"error": "gnn_path must be an existing file under models/"}), 400
+    if gnn_model is None:
+        return jsonify({"error": "GNN candidates need a served GNN and transaction graph"}), 503
+    try:
+        candidate = ModelCandidate(name, load_gnn_model(path), 'gnn', graph_builder)
+    except Exception as e:
+        return jsonify({"error": f"Could not load GNN from {gnn_path}: {e}"}), 400
+    shadow_scorer.register(candidate)
+    return jsonify({"status": "registered", "candidate": name})
+
+@app.route('/api/shadow/candidates/<name>', methods=['DELETE'])
+def remove_shadow_candidate(name):
+    if shadow_scorer is None:
+        return jsonify({"error": "Shadow scoring not available"}), 503
+    shadow_scorer.remove(name)
+    return jsonify({"status": "removed", "candidate": name})
+
+@app.route('/api/cascade/report')
+def get_cascade_report():
+    if cascade_scorer is None:
+        return jsonify({"error": "Cascade scoring not available"}), 503
+    return jsonify({"active": CASCADE_ENABLED, **cascade_scorer.report()})
+
+@app.route('/api/cascade/distill', methods=['POST'])
+def distill_cascade():
+    if cascade_scorer is None:
+        return jsonify({"error": "Cascade scoring not available"}), 503
+    payload = request.json or {}
+    try:
+        first_stage = cascade_scorer.distill(
+            max_depth=int(payload.get('max_depth', 4)),
+            min_samples=int(payload.get('min_samples', 1000)),
+            feature_names=features
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    first_stage.save(CASCADE_MODEL_PATH)
+    return jsonify({"status": "success", "nodes": len(first_stage.value)})
+
+@app.route('/api/cascade/band', methods=['POST'])
+def set_cascade_band():
+    if cascade_scorer is None:
+        return jsonify({"error": "Cascade scoring not available"}), 503
+    payload = request.json or {}
+    try:
+        cascade_scorer.set_band(payload.get('low'), payload.get('high'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"low": cascade_scorer.low, "high": cascade_scorer.high})
+
+@app.route('/api/entity-lists/status')
+def get_entity_list_status():
+    if entity_lists is None:
+        return jsonify({"error": "Entity lists not available"}), 503
+    return jsonify(entity_lists.report())
+
+@app.route('/api/entity-lists/reload', methods=['POST'])
+def reload_entity_lists():
+    if entity_lists is None:
+        return jsonify({"error": "Entity lists not available"}), 503
+    try:
+        snapshot = entity_lists.reload()
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({"status": "reloaded", "sizes": snapshot.sizes()})
+
+@app.route('/api/degradation/status')
+def get_degradation_status():
+    return jsonify(degradation.report())
 
 @app.route('/api/drift/status')
 def get_drift_status():
@@ -510,4 +1006,9 @@ if __name__ == '__main__':
     except:
         print("MLflow not available, continuing without it...")
     
+    # Exit through atexit on SIGTERM so the event and shadow logs close their open segments;
+    # under gunicorn the worker's own SIGTERM handling already exits cleanly
+    import signal, sys
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
     app.run(debug=False, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
\ No newline at end of file
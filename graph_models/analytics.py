@@ -0,0 +1,203 @@
+import hashlib
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _stable_hash(key):
+    # Python's hash() is salted per process, which would make sketches differ between workers
+    return int.from_bytes(hashlib.blake2b(str(key).encode(), digest_size=8).digest(), 'little')
+
+
+class UnionFind:
+    """Disjoint sets with path halving and union by size, O(alpha(n)) per operation.
+
+    Each node carries a weight so a component can report how many nodes of
+    interest (accounts) it holds separately from its total size.
+    """
+
+    def __init__(self):
+        self.parent = {}
+        self.size = {}
+        self.weight = {}
+
+    def add(self, node, weight=1):
+        if node not in self.parent:
+            self.parent[node] = node
+            self.size[node] = 1
+            self.weight[node] = weight
+
+    def find(self, node):
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return root_a
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size.pop(root_b)
+        self.weight[root_a] += self.weight.pop(root_b)
+        return root_a
+
+    def component_weight(self, node):
+        if node not in self.parent:
+            return 0
+        return self.weight[self.find(node)]
+
+    def __contains__(self, node):
+        return node in self.parent
+
+
+class MinHashSketch:
+    """Fixed-size MinHash signature; updates cost O(num_perm), independent of set size"""
+
+    def __init__(self, params):
+        self.params = params
+        self.values = np.full(params.num_perm, _MAX_HASH, dtype=np.uint64)
+
+    def update(self, key):
+        np.minimum(self.values, self.params.hash_values(key), out=self.values)
+
+    def jaccard(self, other):
+        return float(np.mean(self.values == other.values))
+
+
+class MinHashParams:
+    def __init__(self, num_perm=64, seed=1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        # Coefficients below 2**32 keep a * x + b inside uint64 without wrapping
+        self.a = rng.randint(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+
+    def hash_values(self, key):
+        x = np.uint64(_stable_hash(key) & _MAX_HASH)
+        return ((self.a * x + self.b) % np.uint64(_MERSENNE_PRIME)) & np.uint64(_MAX_HASH)
+
+    def estimate_cardinality(self, values):
+        """Estimate distinct count from a (possibly merged) signature of min hashes"""
+        if np.all(values == _MAX_HASH):
+            return 0.0
+        normalised = values.astype(np.float64) / _MAX_HASH
+        return max(0.0, self.num_perm / normalised.sum() - 1.0)
+
+
+class GraphAnalytics:
+    """Incrementally maintained fraud-ring features over the account/device/merchant graph.
+
+    Every edge update is O(1) (degree counters, sketches) or O(alpha(n)) (union-find).
+    Merchants are kept out of the connected components by default because a popular
+    merchant would otherwise merge every customer into one component. For the same
+    reason merchants keep no exact account set; their fan-out comes from the sketch.
+    """
+
+    def __init__(self, num_perm=64, link_merchants=False):
+        self.link_merchants = link_merchants
+        self.components = UnionFind()
+        self.device_accounts = defaultdict(set)
+        self.account_devices = defaultdict(set)
+        self.account_merchants = defaultdict(set)
+        self.minhash = MinHashParams(num_perm)
+        # Sketch of the accounts seen on each device/merchant, for 2-hop reach
+        self.entity_sketches = {}
+        # Sketch of the devices/merchants each account uses, for account overlap
+        self.account_sketches = {}
+        self.edge_count = 0
+        self._lock = threading.Lock()
+
+    def _entity_sketch(self, key):
+        sketch = self.entity_sketches.get(key)
+        if sketch is None:
+            sketch = self.entity_sketches[key] = MinHashSketch(self.minhash)
+        return sketch
+
+    def _account_sketch(self, account_id):
+        sketch = self.account_sketches.get(account_id)
+        if sketch is None:
+            sketch = self.account_sketches[account_id] = MinHashSketch(self.minhash)
+        return sketch
+
+    def _add_edge(self, account_id, entity_key, accounts_by_entity, entities_by_account, link):
+        account_key = ('account', account_id)
+        self.components.add(account_key, weight=1)
+        if entity_key in entities_by_account[account_id]:
+            return
+        if accounts_by_entity is not None:
+            accounts_by_entity[entity_key].add(account_id)
+        entities_by_account[account_id].add(entity_key)
+        self._entity_sketch(entity_key).update(account_id)
+        self._account_sketch(account_id).update(entity_key)
+        if link:
+            self.components.add(entity_key, weight=0)
+            self.components.union(account_key, entity_key)
+        self.edge_count += 1
+
+    def add_transaction(self, transaction):
+        account_id = transaction['AccountID']
+        device_id = transaction.get('DeviceID')
+        merchant_id = transaction.get('MerchantID')
+        with self._lock:
+            if device_id is not None:
+                self._add_edge(account_id, ('device', device_id),
+                               self.device_accounts, self.account_devices, True)
+            if merchant_id is not None:
+                self._add_edge(account_id, ('merchant', merchant_id),
+                               None, self.account_merchants, self.link_merchants)
+
+    def two_hop_accounts(self, account_id, include_merchants=True):
+        """Estimated distinct other accounts sharing a device (or merchant) with this one"""
+        entities = set(self.account_devices.get(account_id, ()))
+        if include_merchants:
+            entities |= self.account_merchants.get(account_id, set())
+        if not entities:
+            return 0.0
+        merged = np.full(self.minhash.num_perm, _MAX_HASH, dtype=np.uint64)
+        for key in entities:
+            np.minimum(merged, self.entity_sketches[key].values, out=merged)
+        return max(0.0, self.minhash.estimate_cardinality(merged) - 1.0)
+
+    def account_overlap(self, account_a, account_b):
+        """Estimated Jaccard similarity of the devices/merchants used by two accounts"""
+        sketch_a = self.account_sketches.get(account_a)
+        sketch_b = self.account_sketches.get(account_b)
+        if sketch_a is None or sketch_b is None:
+            return 0.0
+        return sketch_a.jaccard(sketch_b)
+
+    def merchant_fanout(self, merchant_id):
+        """Estimated distinct accounts seen at a merchant"""
+        sketch = self.entity_sketches.get(('merchant', merchant_id))
+        if sketch is None:
+            return 0.0
+        return self.minhash.estimate_cardinality(sketch.values)
+
+    def get_features(self, account_id, device_id=None, merchant_id=None):
+        """Account features, plus device/merchant fan-out for the ones a transaction used"""
+        with self._lock:
+            devices = self.account_devices.get(account_id, set())
+            features = {
+                'ring_size': self.components.component_weight(('account', account_id)),
+                'account_device_count': len(devices),
+                'account_merchant_count': len(self.account_merchants.get(account_id, ())),
+                'max_device_fanout': max((len(self.device_accounts[key]) for key in devices), default=0),
+                'two_hop_device_accounts': round(self.two_hop_accounts(account_id, include_merchants=False), 1),
+                'two_hop_accounts': round(self.two_hop_accounts(account_id), 1),
+            }
+            if device_id is not None:
+                features['device_account_count'] = len(self.device_accounts.get(('device', device_id), ()))
+            if merchant_id is not None:
+                features['merchant_account_count'] = round(self.merchant_fanout(merchant_id), 1)
+            return features
+
+    def knows_account(self, account_id):
+        return ('account', account_id) in self.components
@@ -1,38 +1,77 @@
+import threading
+
 import torch
 from torch_geometric.data import Data
-from collections import defaultdict
+
+# One-hot node type: account, merchant, device
+NUM_NODE_FEATURES = 3
 
 class TransactionGraphBuilder:
-    def __init__(self):
-        self.node_index = defaultdict(int)
-        self.current_id = 0
-        self.edges = []
-        self.node_features = []
+    """Serving-time account/merchant/device graph, grown one transaction at a time.
+
+    Each account-entity pair becomes one edge in each direction, however many
+    transactions repeat it, so GCN normalisation sees the same simple graph
+    train_gnn.py trains on. Edges and node features live in preallocated
+    tensors that double when full, so adding a transaction is amortised O(1)
+    and ``to_data`` returns views instead of rebuilding the graph.
+    """
+
+    def __init__(self, initial_capacity=1024):
+        self.node_index = {}
         self.node_types = []
-        
+        self.pairs = set()
+        self.num_nodes = 0
+        self.num_edges = 0
+        self._x = torch.zeros((initial_capacity, NUM_NODE_FEATURES), dtype=torch.float)
+        self._edges = torch.empty((2, initial_capacity), dtype=torch.long)
+        self._lock = threading.Lock()
+
     def get_node_id(self, node_key, node_type):
-        if node_key not in self.node_index:
-            self.node_index[node_key] = self.current_id
-            self.current_id += 1
+        node_id = self.node_index.get(node_key)
+        if node_id is None:
+            node_id = self.node_index[node_key] = self.num_nodes
+            if node_id == len(self._x):
+                self._x = torch.cat([self._x, torch.zeros_like(self._x)])
             # Simple feature representation
-            self.node_features.append([1.0 if i == node_type else 0.0 for i in range(3)])
+            self._x[node_id, node_type] = 1.0
             self.node_types.append(node_type)
-        return self.node_index[node_key]
-    
+            self.num_nodes += 1
+        return node_id
+
+    def _add_pair(self, acc_id, entity_id):
+        if (acc_id, entity_id) in self.pairs:
+            return
+        self.pairs.add((acc_id, entity_id))
+        if self.num_edges + 2 > self._edges.shape[1]:
+            self._edges = torch.cat([self._edges, torch.empty_like(self._edges)], dim=1)
+        # Both directions so account nodes receive messages too
+        self._edges[:, self.num_edges] = torch.tensor([acc_id, entity_id])
+        self._edges[:, self.num_edges + 1] = torch.tensor([entity_id, acc_id])
+        self.num_edges += 2
+
+    def add_edges(self, transaction):
+        """Add the transaction's nodes and any new edges; cheap enough to run for every transaction"""
+        with self._lock:
+            # Keyed by type as well as ID, like the per-column node ids train_gnn.py builds
+            # Account node (type 0)
+            acc_id = self.get_node_id(('account', transaction['AccountID']), 0)
+            # Merchant node (type 1)
+            merchant_id = self.get_node_id(('merchant', transaction['MerchantID']), 1)
+            # Device node (type 2)
+            device_id = self.get_node_id(('device', transaction['DeviceID']), 2)
+
+            self._add_pair(acc_id, merchant_id)
+            self._add_pair(acc_id, device_id)
+        return acc_id
+
+    def to_data(self, account_index):
+        """Current graph in PyG format, centred on one account node"""
+        with self._lock:
+            # Views of the filled prefix; later appends only write past it
+            x = self._x[:self.num_nodes]
+            edge_index = self._edges[:, :self.num_edges]
+
+        return Data(x=x, edge_index=edge_index, account_index=account_index)
+
     def add_transaction(self, transaction):
-        # Account node (type 0)
-        acc_id = self.get_node_id(transaction['AccountID'], 0)
-        # Merchant node (type 1)
-        merchant_id = self.get_node_id(transaction['MerchantID'], 1)
-        # Device node (type 2)
-        device_id = self.get_node_id(transaction['DeviceID'], 2)
-        
-        # Add edges
-        self.edges.append((acc_id, merchant_id))
-        self.edges.append((acc_id, device_id))
-        
-        # Convert to PyG format
-        edge_index = torch.tensor(list(zip(*self.edges)), dtype=torch.long)
-        x = torch.tensor(self.node_features, dtype=torch.float)
-        
-        return Data(x=x, edge_index=edge_index)
\ No newline at end of file
+        return self.to_data(self.add_edges(transaction))
@@ -4,6 +4,8 @@ import torch.nn.functional as F
 from torch_geometric.nn import GCNConv
 import os
 
+from graph_models.data_loader import NUM_NODE_FEATURES
+
 class FraudGNN(nn.Module):
     def __init__(self, num_node_features, hidden_channels):
         super(FraudGNN, self).__init__()
@@ -11,30 +13,42 @@ class FraudGNN(nn.Module):
         self.conv2 = GCNConv(hidden_channels, hidden_channels)
         self.classifier = nn.Linear(hidden_channels, 1)
         
-    def forward(self, x, edge_index):
+    def embed(self, x, edge_index):
         # Node embeddings
         x = self.conv1(x, edge_index)
         x = F.relu(x)
         x = F.dropout(x, training=self.training)
-        x = self.conv2(x, edge_index)
+        return self.conv2(x, edge_index)
+
+    def node_logits(self, x, edge_index):
+        # Per-node scores, used for neighbor-sampled mini-batch training
+        return self.classifier(self.embed(x, edge_index)).squeeze(-1)
+
+    def node_probabilities(self, x, edge_index):
+        return torch.sigmoid(self.node_logits(x, edge_index))
+
+    def forward(self, x, edge_index):
+        x = self.embed(x, edge_index)
         
         # Graph-level classification
         x = torch.mean(x, dim=0)  # Global mean pooling
         x = self.classifier(x)
         return torch.sigmoid(x)
 
-def load_gnn_model(model_path='trained_models/gnn_model.pt', device='cpu'):
+def load_gnn_model(model_path='models/gnn_model.pt', device='cpu'):
     # Create models directory if it doesn't exist
     os.makedirs('models', exist_ok=True)
     
-    # Initialize model
-    model = FraudGNN(num_node_features=32, hidden_channels=64)
-    
     try:
-        # Try to load pretrained weights
-        model.load_state_dict(torch.load(model_path))
+        # Try to load pretrained weights; conv1's weight is (hidden_channels, num_node_features)
+        state_dict = torch.load(model_path, map_location=device)
+        hidden_channels = next(t.shape[0] for k, t in state_dict.items() if k.startswith('conv1') and t.dim() == 2)
+        model = FraudGNN(num_node_features=NUM_NODE_FEATURES, hidden_channels=hidden_channels)
+        model.load_state_dict(state_dict)
         print(f"Loaded GNN model from {model_path}")
     except FileNotFoundError:
+        # Must match the node features TransactionGraphBuilder produces at serve time
+        model = FraudGNN(num_node_features=NUM_NODE_FEATURES, hidden_channels=64)
         # If no model exists, initialize with random weights and save
         print(f"No model found at {model_path}, creating new model")
         torch.save(model.state_dict(), model_path)
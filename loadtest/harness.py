@@ -0,0 +1,298 @@
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+LOCATIONS = ["New York, NY", "Los Angeles, CA", "Chicago, IL", "Houston, TX", "Miami, FL",
+             "Seattle, WA", "Boston, MA", "Denver, CO", "Atlanta, GA", "Phoenix, AZ"]
+CHANNELS = ["Online", "ATM", "Branch"]
+OCCUPATIONS = ["Student", "Doctor", "Engineer", "Retired"]
+
+
+class ZipfSampler:
+    """Bounded Zipf over ranks 0..n-1 via an inverse-CDF table"""
+
+    def __init__(self, n, exponent, rng):
+        weights = 1.0 / np.arange(1, n + 1) ** exponent
+        self.cdf = np.cumsum(weights / weights.sum())
+        self.rng = rng
+
+    def sample(self):
+        return int(np.searchsorted(self.cdf, self.rng.random_sample()))
+
+
+class TrafficSynthesizer:
+    """Realistic-looking /api/analyze payloads.
+
+    Accounts, merchants and devices are Zipf-distributed so a few customers and
+    merchants dominate, each account mostly reuses its home device, and fraud
+    arrives in bursts: a small ring of mule accounts sharing one device pushes
+    a run of large transactions in quick succession.
+    """
+
+    def __init__(self, num_accounts=50000, num_merchants=2000, num_devices=60000,
+                 exponent=1.1, burst_probability=0.002, burst_size=(5, 30), seed=7):
+        self.rng = np.random.RandomState(seed)
+        self.accounts = ZipfSampler(num_accounts, exponent, self.rng)
+        self.merchants = ZipfSampler(num_merchants, exponent, self.rng)
+        self.devices = ZipfSampler(num_devices, exponent, self.rng)
+        self.num_devices = num_devices
+        self.burst_probability = burst_probability
+        self.burst_size = burst_size
+        self._burst = []
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    def _home_device(self, account):
+        return (account * 2654435761) % self.num_devices
+
+    def _base(self, account, device, merchant, amount, login_attempts):
+        now = datetime.now()
+        self._counter += 1
+        return {
+            "TransactionID": f"LT{self._counter:09d}",
+            "AccountID": f"AC{account:06d}",
+            "TransactionAmount": round(amount, 2),
+            "TransactionDate": now.strftime(DATE_FORMAT),
+            "TransactionType": "Debit" if self.rng.random_sample() < 0.8 else "Credit",
+            "Location": LOCATIONS[account % len(LOCATIONS)],
+            "DeviceID": f"D{device:06d}",
+            "MerchantID": f"M{merchant:04d}",
+            "Channel": CHANNELS[int(self.rng.randint(len(CHANNELS)))],
+            "CustomerOccupation": OCCUPATIONS[account % len(OCCUPATIONS)],
+            "TransactionDuration": int(self.rng.randint(10, 300)),
+            "LoginAttempts": login_attempts,
+            "AccountBalance": round(float(self.rng.lognormal(8.5, 1.0)), 2),
+            "PreviousTransactionDate": (now - timedelta(days=int(self.rng.randint(0, 30)))).strftime(DATE_FORMAT),
+        }
+
+    def _start_burst(self):
+        ring = [self.accounts.sample() for _ in range(int(self.rng.randint(2, 6)))]
+        device = int(self.rng.randint(self.num_devices))
+        merchant = self.merchants.sample()
+        for _ in range(int(self.rng.randint(*self.burst_size))):
+            account = ring[int(self.rng.randint(len(ring)))]
+            amount = float(self.rng.uniform(2000, 9500))
+            self._burst.append(self._base(account, device, merchant, amount, int(self.rng.randint(1, 5))))
+
+    def next(self):
+        with self._lock:
+            if not self._burst and self.rng.random_sample() < self.burst_probability:
+                self._start_burst()
+            if self._burst:
+                return 'analyze', self._burst.pop()
+            account = self.accounts.sample()
+            device = self._home_device(account) if self.rng.random_sample() < 0.9 else self.devices.sample()
+            amount = float(self.rng.lognormal(4.5, 1.1))
+            return 'analyze', self._base(account, device, self.merchants.sample(), amount, 1)
+
+
+class CsvReplay:
+    """Replays data/bank_transactions_data_2.csv rows as payloads, looping if needed"""
+
+    def __init__(self, csv_path, loop=True):
+        import pandas as pd
+
+        df = pd.read_csv(csv_path)
+        df = df.sort_values('TransactionDate').drop(columns=['IP Address', 'CustomerAge'], errors='ignore')
+        self.rows = df.to_dict('records')
+        self.loop = loop
+        self._index = 0
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            if self._index >= len(self.rows):
+                if not self.loop:
+                    return None
+                self._index = 0
+            row = dict(self.rows[self._index])
+            self._index += 1
+        return 'analyze', row
+
+
+class EndpointMix:
+    """Interleaves read endpoints with the analyze traffic of a source"""
+
+    def __init__(self, source, mix, seed=11):
+        self.source = source
+        self.mix = mix
+        self.rng = random.Random(seed)
+        self.recent_accounts = []
+
+    def next(self):
+        roll = self.rng.random()
+        for endpoint, share in self.mix.items():
+            if roll < share:
+                if endpoint == 'transactions':
+                    return 'transactions', None
+                if endpoint == 'graph' and self.recent_accounts:
+                    return 'graph', self.rng.choice(self.recent_accounts)
+                break
+            roll -= share
+        item = self.source.next()
+        if item is not None:
+            self.recent_accounts.append(item[1]['AccountID'])
+            del self.recent_accounts[:-1000]
+        return item
+
+
+class InProcessTarget:
+    """Drives the Flask app through its test client, one client per thread"""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def _client(self):
+        if not hasattr(self._local, 'client'):
+            self._local.client = self.app.test_client()
+        return self._local.client
+
+    def call(self, endpoint, payload):
+        client = self._client()
+        if endpoint == 'analyze':
+            return client.post('/api/analyze', json=payload).status_code
+        if endpoint == 'graph':
+            return client.get(f'/api/graph/{payload}').status_code
+        return client.get('/api/transactions?days=1').status_code
+
+
+class HttpTarget:
+    """Drives a running server over HTTP, one keep-alive session per thread"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self._local = threading.local()
+
+    def _session(self):
+        if not hasattr(self._local, 'session'):
+            import requests
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def call(self, endpoint, payload):
+        session = self._session()
+        if endpoint == 'analyze':
+            return session.post(f'{self.base_url}/api/analyze', json=payload, timeout=30).status_code
+        if endpoint == 'graph':
+            return session.get(f'{self.base_url}/api/graph/{payload}', timeout=30).status_code
+        return session.get(f'{self.base_url}/api/transactions?days=1', timeout=30).status_code
+
+
+class LatencyRecorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.corrected = {}
+        self.service = {}
+        self.errors = {}
+
+    def record(self, endpoint, corrected_ms, service_ms, ok):
+        with self.lock:
+            self.corrected.setdefault(endpoint, []).append(corrected_ms)
+            self.service.setdefault(endpoint, []).append(service_ms)
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + (not ok)
+
+    def summary(self, elapsed):
+        result = {}
+        with self.lock:
+            for endpoint, latencies in self.corrected.items():
+                corrected = np.asarray(latencies)
+                service = np.asarray(self.service[endpoint])
+                result[endpoint] = {
+                    'count': len(corrected),
+                    'errors': self.errors[endpoint],
+                    'throughput': len(corrected) / elapsed,
+                    'p50': float(np.percentile(corrected, 50)),
+                    'p99': float(np.percentile(corrected, 99)),
+                    'p999': float(np.percentile(corrected, 99.9)),
+                    'service_p99': float(np.percentile(service, 99)),
+                }
+        return result
+
+
+def run_open_loop(target, source, tps, duration, max_workers=64, poisson=True, seed=3):
+    """Issue requests on a fixed schedule regardless of how fast responses come back.
+
+    Latency is measured from each request's *intended* send time, so time spent
+    queued behind a saturated server is counted (no coordinated omission).
+    """
+    rng = random.Random(seed)
+    recorder = LatencyRecorder()
+    start = time.perf_counter()
+    next_send = start
+    end = start + duration
+
+    def issue(endpoint, payload, intended):
+        sent = time.perf_counter()
+        try:
+            ok = target.call(endpoint, payload) < 400
+        except Exception:
+            ok = False
+        done = time.perf_counter()
+        recorder.record(endpoint, (done - intended) * 1000.0, (done - sent) * 1000.0, ok)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while next_send < end:
+            item = source.next()
+            if item is None:
+                break
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(issue, item[0], item[1], next_send)
+            next_send += rng.expovariate(tps) if poisson else 1.0 / tps
+    elapsed = time.perf_counter() - start
+    return recorder.summary(elapsed), elapsed
+
+
+def print_report(target_tps, summary, elapsed):
+    print(f"\nTarget {target_tps:.0f} TPS over {elapsed:.1f}s")
+    print(f"{'endpoint':<14}{'count':>8}{'errors':>8}{'tps':>9}{'p50 ms':>10}{'p99 ms':>10}"
+          f"{'p999 ms':>10}{'svc p99':>10}")
+    for endpoint, stats in sorted(summary.items()):
+        print(f"{endpoint:<14}{stats['count']:>8}{stats['errors']:>8}{stats['throughput']:>9.1f}"
+              f"{stats['p50']:>10.1f}{stats['p99']:>10.1f}{stats['p999']:>10.1f}{stats['service_p99']:>10.1f}")
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        if part:
+            name, share = part.split('=')
+            mix[name] = float(share)
+    return mix
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Open-loop load generator for the fraud detection API")
+    parser.add_argument('--url', help="Base URL of a running server; omit to drive app.py in-process")
+    parser.add_argument('--source', choices=['synthetic', 'csv'], default='synthetic')
+    parser.add_argument('--csv', default='data/bank_transactions_data_2.csv')
+    parser.add_argument('--tps', type=float, nargs='+', default=[50.0],
+                        help="One or more target rates; several values run a ramp to find saturation")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds per step")
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('transactions=0.02,graph=0.03'),
+                        help="Share of read endpoints, e.g. transactions=0.02,graph=0.03")
+    parser.add_argument('--uniform', action='store_true', help="Fixed inter-arrival times instead of Poisson")
+    args = parser.parse_args()
+
+    if args.url:
+        target = HttpTarget(args.url)
+    else:
+        from app import app
+        target = InProcessTarget(app)
+
+    base_source = TrafficSynthesizer() if args.source == 'synthetic' else CsvReplay(args.csv)
+    source = EndpointMix(base_source, args.mix)
+
+    for tps in args.tps:
+        summary, elapsed = run_open_loop(target, source, tps, args.duration, args.workers,
+                                         poisson=not args.uniform)
+        print_report(tps, summary, elapsed)
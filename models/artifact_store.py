@@ -0,0 +1,519 @@
+import hashlib
+import json
+import os
+import sys
+import warnings
+from datetime import datetime
+
+import numpy as np
+
+ARTIFACT_FORMAT_VERSION = 1
+DEFAULT_STORE_DIR = "models/store"
+MANIFEST_NAME = "manifest.json"
+
+
+class ArtifactError(Exception):
+    pass
+
+
+def _sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _average_path_length(n_samples):
+    """Vectorised copy of sklearn's average path length of an unsuccessful BST search"""
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    result = np.zeros_like(n_samples)
+    mask_2 = n_samples == 2
+    mask_n = n_samples > 2
+    result[mask_2] = 1.0
+    n = n_samples[mask_n]
+    result[mask_n] = 2.0 * (np.log(n - 1.0) + np.euler_gamma) - 2.0 * (n - 1.0) / n
+    return result
+
+
+class ArtifactWriter:
+    """Writes a directory of .npy arrays plus a manifest with checksums"""
+
+    def __init__(self, store_dir, name, kind, version=None):
+        self.name = name
+        self.kind = kind
+        self.version = version or datetime.now().strftime("%Y%m%d%H%M%S")
+        self.path = os.path.join(store_dir, name, self.version)
+        self.files = {}
+        self.meta = {}
+        os.makedirs(self.path, exist_ok=True)
+
+    def add_array(self, key, array):
+        array = np.ascontiguousarray(array)
+        filename = f"{key}.npy"
+        np.save(os.path.join(self.path, filename), array, allow_pickle=False)
+        self.files[filename] = {'shape': list(array.shape), 'dtype': str(array.dtype)}
+
+    def add_file(self, filename, writer):
+        writer(os.path.join(self.path, filename))
+        self.files[filename] = {}
+
+    def commit(self):
+        for filename, info in self.files.items():
+            full_path = os.path.join(self.path, filename)
+            info['sha256'] = _sha256(full_path)
+            info['bytes'] = os.path.getsize(full_path)
+
+        manifest = {
+            'format_version': ARTIFACT_FORMAT_VERSION,
+            'name': self.name,
+            'kind': self.kind,
+            'version': self.version,
+            'created_at': datetime.now().isoformat(),
+            'digest': _manifest_digest(self.files),
+            'files': self.files,
+            'meta': self.meta,
+        }
+        tmp_path = os.path.join(self.path, MANIFEST_NAME + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST_NAME))
+
+        # Point "current" at the new version only once the manifest is complete
+        current_path = os.path.join(os.path.dirname(self.path), 'CURRENT')
+        with open(current_path + '.tmp', 'w') as f:
+            f.write(self.version)
+        os.replace(current_path + '.tmp', current_path)
+        return manifest
+
+
+def _manifest_digest(files):
+    digest = hashlib.sha256()
+    for filename in sorted(files):
+        digest.update(filename.encode())
+        digest.update(files[filename]['sha256'].encode())
+    return digest.hexdigest()
+
+
+class Artifact:
+    """A committed artifact whose arrays are memory-mapped read-only"""
+
+    def __init__(self, path, verify=True):
+        self.path = path
+        manifest_path = os.path.join(path, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            raise ArtifactError(f"No manifest found in {path}")
+        with open(manifest_path) as f:
+            self.manifest = json.load(f)
+
+        if self.manifest.get('format_version') != ARTIFACT_FORMAT_VERSION:
+            raise ArtifactError(
+                f"Unsupported artifact format {self.manifest.get('format_version')} in {path}"
+            )
+        if verify:
+            self.verify()
+
+    @property
+    def meta(self):
+        return self.manifest['meta']
+
+    def verify(self):
+        for filename, info in self.manifest['files'].items():
+            checksum = _sha256(os.path.join(self.path, filename))
+            if checksum != info['sha256']:
+                raise ArtifactError(f"Checksum mismatch for {filename} in {self.path}")
+
+    def array(self, key):
+        # mmap_mode='r' keeps the pages in the shared page cache, so every
+        # worker process that maps the same file shares one physical copy
+        return np.load(os.path.join(self.path, f"{key}.npy"), mmap_mode='r', allow_pickle=False)
+
+    def file_path(self, filename):
+        return os.path.join(self.path, filename)
+
+    def describe(self):
+        return {
+            'name': self.manifest['name'],
+            'kind': self.manifest['kind'],
+            'version': self.manifest['version'],
+            'digest': self.manifest['digest'],
+            'created_at': self.manifest['created_at'],
+            'path': self.path,
+        }
+
+
+def resolve_artifact_path(name, store_dir=DEFAULT_STORE_DIR, version=None):
+    root = os.path.join(store_dir, name)
+    if version is None:
+        try:
+            with open(os.path.join(root, 'CURRENT')) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            raise ArtifactError(f"No current version recorded for artifact '{name}'")
+    return os.path.join(root, version)
+
+
+def _stack_trees(trees, writer, value_fn):
+    """Concatenate per-tree node tables into single arrays with global child indices"""
+    offsets, children_left, children_right, feature, threshold, values = [], [], [], [], [], []
+    max_depth = 0
+    offset = 0
+    for tree in trees:
+        left = tree['children_left'].astype(np.int32)
+        right = tree['children_right'].astype(np.int32)
+        is_leaf = left == -1
+        # Leaves point at themselves so that batched traversal can run a fixed number of steps
+        node_ids = np.arange(len(left), dtype=np.int32)
+        left = np.where(is_leaf, node_ids, left) + offset
+        right = np.where(is_leaf, node_ids, right) + offset
+        children_left.append(left)
+        children_right.append(right)
+        feature.append(np.where(is_leaf, 0, tree['feature']).astype(np.int32))
+        # Kept in the dtype the exporter chose, so comparisons match the original model bit for bit
+        threshold.append(tree['threshold'])
+        values.append(value_fn(tree).astype(np.float64))
+        offsets.append(offset)
+        max_depth = max(max_depth, tree['max_depth'])
+        offset += len(left)
+
+    writer.add_array('roots', np.asarray(offsets, dtype=np.int32))
+    writer.add_array('children_left', np.concatenate(children_left))
+    writer.add_array('children_right', np.concatenate(children_right))
+    writer.add_array('feature', np.concatenate(feature))
+    writer.add_array('threshold', np.concatenate(threshold))
+    writer.add_array('value', np.concatenate(values))
+    writer.meta['max_depth'] = int(max_depth)
+
+
+class _TreeTable:
+    """Batched traversal over a memory-mapped node table"""
+
+    def __init__(self, artifact):
+        self.roots = artifact.array('roots')
+        self.children_left = artifact.array('children_left')
+        self.children_right = artifact.array('children_right')
+        self.feature = artifact.array('feature')
+        self.threshold = artifact.array('threshold')
+        self.value = artifact.array('value')
+        self.max_depth = artifact.meta['max_depth']
+
+    def leaves(self, X, go_left_fn, tree_features=None):
+        n_rows = X.shape[0]
+        node = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+        rows = np.arange(n_rows)[:, None]
+        for _ in range(self.max_depth):
+            feat = self.feature[node]
+            if tree_features is not None:
+                feat = tree_features[np.arange(len(self.roots))[None, :], feat]
+            x = X[rows, feat]
+            node = np.where(go_left_fn(x, node), self.children_left[node], self.children_right[node])
+        return node
+
+
+def _as_matrix(X):
+    if hasattr(X, 'values'):
+        X = X.values
+    # sklearn and XGBoost both compare float32 inputs; a float64 2-decimal amount
+    # can land on the other side of a split learned from its float32 rounding
+    X = np.asarray(X, dtype=np.float32)
+    if X.ndim == 1:
+        X = X[None, :]
+    return X
+
+
+def export_isolation_forest(model, store_dir=DEFAULT_STORE_DIR, name='isolation_forest', version=None):
+    writer = ArtifactWriter(store_dir, name, 'isolation_forest', version)
+
+    trees = []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        trees.append({
+            'children_left': tree.children_left,
+            'children_right': tree.children_right,
+            'feature': tree.feature,
+            # float64 midpoints between float32 values, compared with float32 inputs as sklearn does
+            'threshold': tree.threshold.astype(np.float64),
+            'n_node_samples': tree.n_node_samples,
+            'max_depth': tree.max_depth,
+        })
+
+    def path_length(tree):
+        # Depth of every node plus the expected remaining depth of its leaf sample
+        depth = np.zeros(len(tree['children_left']), dtype=np.float64)
+        for node_id in range(len(depth)):
+            for child in (tree['children_left'][node_id], tree['children_right'][node_id]):
+                if child != -1:
+                    depth[child] = depth[node_id] + 1
+        return depth + _average_path_length(tree['n_node_samples'])
+
+    _stack_trees(trees, writer, path_length)
+
+    n_features = model.n_features_in_
+    estimator_features = np.asarray(model.estimators_features_, dtype=np.int32)
+    subsample_features = estimator_features.shape[1] != n_features
+    if subsample_features:
+        writer.add_array('tree_features', estimator_features)
+
+    writer.meta.update({
+        'n_features': int(n_features),
+        'n_estimators': len(model.estimators_),
+        'max_samples': int(model.max_samples_),
+        'offset': float(model.offset_),
+        'subsample_features': bool(subsample_features),
+        'feature_names': [str(f) for f in getattr(model, 'feature_names_in_', [])],
+    })
+    return writer.commit()
+
+
+class MmapIsolationForest:
+    """Drop-in scorer for IsolationForest.decision_function over mmap'd trees"""
+
+    def __init__(self, artifact):
+        self.artifact = artifact
+        self.trees = _TreeTable(artifact)
+        meta = artifact.meta
+        self.offset_ = meta['offset']
+        self.n_estimators = meta['n_estimators']
+        self.tree_features = artifact.array('tree_features') if meta['subsample_features'] else None
+        self._normaliser = self.n_estimators * _average_path_length([meta['max_samples']])[0]
+
+    def score_samples(self, X):
+        X = _as_matrix(X)
+        trees = self.trees
+        leaves = trees.leaves(
+            X,
+            lambda x, node: x <= trees.threshold[node],
+            self.tree_features,
+        )
+        depths = trees.value[leaves].sum(axis=1)
+        return -(2.0 ** (-depths / self._normaliser))
+
+    def decision_function(self, X):
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X):
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+
+def export_xgboost(model, store_dir=DEFAULT_STORE_DIR, name='xgboost', version=None, feature_names=None):
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    config = json.loads(booster.save_config())
+    objective = config['learner']['objective']['name']
+    if objective != 'binary:logistic':
+        raise ArtifactError(f"Only binary:logistic XGBoost models are supported, got {objective}")
+
+    feature_names = list(feature_names or booster.feature_names or [])
+    feature_index = {f: i for i, f in enumerate(feature_names)}
+
+    def feature_to_index(value):
+        if value in feature_index:
+            return feature_index[value]
+        if isinstance(value, str) and value.startswith('f') and value[1:].isdigit():
+            return int(value[1:])
+        raise ArtifactError(f"Unknown XGBoost feature '{value}'")
+
+    df = booster.trees_to_dataframe()
+    if 'Category' in df.columns and df['Category'].notna().any():
+        raise ArtifactError("Categorical XGBoost splits are not supported by the mmap format")
+
+    trees = []
+    for _, tree_df in df.groupby('Tree', sort=True):
+        tree_df = tree_df.sort_values('Node')
+        n_nodes = len(tree_df)
+        node_pos = {node_id: pos for pos, node_id in enumerate(tree_df['ID'])}
+        left = np.full(n_nodes, -1, dtype=np.int32)
+        right = np.full(n_nodes, -1, dtype=np.int32)
+        missing_left = np.zeros(n_nodes, dtype=bool)
+        feature = np.zeros(n_nodes, dtype=np.int32)
+        # XGBoost splits are float32 and compared against float32 inputs
+        threshold = np.zeros(n_nodes, dtype=np.float32)
+        leaf_value = np.zeros(n_nodes, dtype=np.float64)
+        depth = np.zeros(n_nodes, dtype=np.int32)
+
+        for pos, row in enumerate(tree_df.itertuples(index=False)):
+            if row.Feature == 'Leaf':
+                leaf_value[pos] = row.Gain
+                continue
+            left[pos] = node_pos[row.Yes]
+            right[pos] = node_pos[row.No]
+            missing_left[pos] = row.Missing == row.Yes
+            feature[pos] = feature_to_index(row.Feature)
+            threshold[pos] = row.Split
+            depth[left[pos]] = depth[pos] + 1
+            depth[right[pos]] = depth[pos] + 1
+
+        trees.append({
+            'children_left': left,
+            'children_right': right,
+            'feature': feature,
+            'threshold': threshold,
+            'leaf_value': leaf_value,
+            'missing_left': missing_left,
+            'max_depth': int(depth.max()),
+        })
+
+    writer = ArtifactWriter(store_dir, name, 'xgboost', version)
+    _stack_trees(trees, writer, lambda tree: tree['leaf_value'])
+    writer.add_array('missing_left', np.concatenate([t['missing_left'] for t in trees]))
+
+    # XGBoost 3 writes base_score as a one-element vector, e.g. '[2.5E-1]'
+    base_score = float(str(config['learner']['learner_model_param']['base_score']).strip('[]'))
+    writer.meta.update({
+        'n_features': len(feature_names) or None,
+        'n_trees': len(trees),
+        'base_margin': float(np.log(base_score / (1.0 - base_score))),
+        'feature_names': feature_names,
+        'objective': objective,
+    })
+    return writer.commit()
+
+
+class MmapXGBClassifier:
+    """Drop-in scorer for XGBClassifier.predict_proba over mmap'd trees"""
+
+    def __init__(self, artifact):
+        self.artifact = artifact
+        self.trees = _TreeTable(artifact)
+        self.missing_left = artifact.array('missing_left')
+        self.base_margin = artifact.meta['base_margin']
+
+    def _go_left(self, x, node):
+        # XGBoost sends x < split to the "yes" branch and NaN to the "missing" branch
+        return np.where(np.isnan(x), self.missing_left[node], x < self.trees.threshold[node])
+
+    def predict_margin(self, X):
+        X = _as_matrix(X)
+        leaves = self.trees.leaves(X, self._go_left)
+        return self.trees.value[leaves].sum(axis=1) + self.base_margin
+
+    def predict_proba(self, X):
+        prob = 1.0 / (1.0 + np.exp(-self.predict_margin(X)))
+        return np.column_stack([1.0 - prob, prob])
+
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(int)
+
+
+def export_gnn(state_dict, store_dir=DEFAULT_STORE_DIR, name='gnn', version=None, hidden_channels=None):
+    writer = ArtifactWriter(store_dir, name, 'gnn', version)
+    keys = []
+    for key, tensor in state_dict.items():
+        writer.add_array(key, tensor.detach().cpu().numpy())
+        keys.append(key)
+
+    num_node_features = None
+    for key, tensor in state_dict.items():
+        if key.startswith('conv1') and tensor.dim() == 2:
+            # conv1's weight is (hidden_channels, num_node_features)
+            num_node_features = int(tensor.shape[1])
+            if hidden_channels is None:
+                hidden_channels = int(tensor.shape[0])
+    if hidden_channels is None:
+        raise ArtifactError("Cannot infer hidden_channels: no conv1 weight in the GNN state dict")
+    writer.meta.update({
+        'state_dict_keys': keys,
+        'num_node_features': num_node_features,
+        'hidden_channels': int(hidden_channels),
+    })
+    return writer.commit()
+
+
+def load_mmap_gnn(artifact, device='cpu'):
+    import torch
+    from graph_models.gnn_model import FraudGNN
+
+    meta = artifact.meta
+    model = FraudGNN(num_node_features=meta['num_node_features'], hidden_channels=meta['hidden_channels'])
+    with warnings.catch_warnings():
+        # torch warns that read-only numpy buffers are not writable; inference never writes
+        warnings.simplefilter('ignore', UserWarning)
+        state_dict = {key: torch.from_numpy(artifact.array(key)) for key in meta['state_dict_keys']}
+
+    try:
+        # assign=True makes the parameters alias the mapped pages instead of copying them
+        model.load_state_dict(state_dict, assign=True)
+    except TypeError:
+        model.load_state_dict(state_dict)
+    model.to(device)
+    model.eval()
+    return model
+
+
+def export_shap_explainer(explainer, store_dir=DEFAULT_STORE_DIR, name='shap_explainer', version=None):
+    import joblib
+
+    writer = ArtifactWriter(store_dir, name, 'shap_explainer', version)
+    # Uncompressed joblib pickles keep numpy buffers page-aligned so they can be mmap'd on load
+    writer.add_file('explainer.joblib', lambda path: joblib.dump(explainer, path, compress=0))
+    writer.meta['explainer_type'] = type(explainer).__name__
+    return writer.commit()
+
+
+def load_mmap_shap_explainer(artifact):
+    import joblib
+    return joblib.load(artifact.file_path('explainer.joblib'), mmap_mode='r')
+
+
+_LOADERS = {
+    'isolation_forest': MmapIsolationForest,
+    'xgboost': MmapXGBClassifier,
+    'gnn': load_mmap_gnn,
+    'shap_explainer': load_mmap_shap_explainer,
+}
+
+
+class ModelArtifactStore:
+    """Loads serving models from the mmap store and tracks what each worker serves"""
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, verify=True):
+        self.store_dir = store_dir
+        self.verify = verify
+        self.loaded = {}
+
+    def has(self, name):
+        return os.path.exists(os.path.join(self.store_dir, name, 'CURRENT'))
+
+    def load(self, name, version=None):
+        artifact = Artifact(resolve_artifact_path(name, self.store_dir, version), verify=self.verify)
+        model = _LOADERS[artifact.manifest['kind']](artifact)
+        self.loaded[name] = artifact
+        return model
+
+    def describe(self):
+        return {
+            'pid': os.getpid(),
+            'store_dir': self.store_dir,
+            'artifacts': {name: artifact.describe() for name, artifact in self.loaded.items()},
+        }
+
+
+def export_all(models_dir='models', store_dir=DEFAULT_STORE_DIR):
+    """Convert the pickled models in models_dir into the mmap artifact store"""
+    import joblib
+
+    exported = {}
+    iso_path = os.path.join(models_dir, 'isolation_forest.pkl')
+    if os.path.exists(iso_path):
+        exported['isolation_forest'] = export_isolation_forest(joblib.load(iso_path), store_dir)
+
+    xgb_path = os.path.join(models_dir, 'xgboost.pkl')
+    if os.path.exists(xgb_path):
+        exported['xgboost'] = export_xgboost(joblib.load(xgb_path), store_dir)
+
+    shap_path = os.path.join(models_dir, 'shap_explainer.pkl')
+    if os.path.exists(shap_path):
+        exported['shap_explainer'] = export_shap_explainer(joblib.load(shap_path), store_dir)
+
+    gnn_path = os.path.join(models_dir, 'gnn_model.pt')
+    if os.path.exists(gnn_path):
+        import torch
+        exported['gnn'] = export_gnn(torch.load(gnn_path, map_location='cpu'), store_dir)
+
+    return exported
+
+
+if __name__ == '__main__':
+    models_dir = sys.argv[1] if len(sys.argv) > 1 else 'models'
+    store_dir = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_STORE_DIR
+    for name, manifest in export_all(models_dir, store_dir).items():
+        print(f"Exported {name} version {manifest['version']} ({manifest['digest'][:12]})")
@@ -0,0 +1,399 @@
+import copy
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from models.labels import fraud_labels
+from serving.schema import CHANNEL_CODES, FEATURE_NAMES, OCCUPATION_CODES, stable_bucket
+
+CSV_DTYPES = {
+    'TransactionID': 'string',
+    'AccountID': 'string',
+    'TransactionAmount': 'float64',
+    'TransactionType': 'string',
+    'Location': 'string',
+    'DeviceID': 'string',
+    'IP Address': 'string',
+    'MerchantID': 'string',
+    'Channel': 'string',
+    'CustomerAge': 'float32',
+    'CustomerOccupation': 'string',
+    'TransactionDuration': 'float64',
+    'LoginAttempts': 'int32',
+    'AccountBalance': 'float64',
+}
+DATE_COLUMNS = ['TransactionDate', 'PreviousTransactionDate']
+
+XGBOOST_SPACE = [
+    {'max_depth': depth, 'learning_rate': lr, 'subsample': subsample}
+    for depth in (3, 5, 7) for lr in (0.05, 0.1, 0.3) for subsample in (0.8, 1.0)
+]
+ISOLATION_FOREST_SPACE = [
+    {'max_samples': max_samples, 'max_features': max_features}
+    for max_samples in (256, 1024) for max_features in (0.5, 1.0)
+]
+
+
+def _family(kind):
+    """Served model a trial kind produces; trials are only ranked against their own
+    family, as IF and XGBoost AUCs against the same labels are not comparable"""
+    return kind[:-len('_warm')] if kind.endswith('_warm') else kind
+
+
+def load_transactions(csv_path, since=None, chunksize=100_000):
+    """Read the CSV in typed chunks, keeping only rows after ``since`` if given"""
+    chunks = []
+    for chunk in pd.read_csv(csv_path, dtype=CSV_DTYPES, parse_dates=DATE_COLUMNS, chunksize=chunksize):
+        if since is not None:
+            chunk = chunk[chunk['TransactionDate'] > since]
+        if len(chunk):
+            chunks.append(chunk)
+    if not chunks:
+        return pd.DataFrame(columns=list(CSV_DTYPES) + DATE_COLUMNS)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def build_features(df, now=None):
+    """Vectorised version of the feature row the analyze endpoint builds"""
+    now = pd.Timestamp(now or datetime.now())
+    stats = df.groupby('AccountID').agg(
+        AvgAmount=('TransactionAmount', 'mean'),
+        StdAmount=('TransactionAmount', 'std'),
+        MaxAmount=('TransactionAmount', 'max'),
+        AvgDuration=('TransactionDuration', 'mean'),
+        UniqueLocations=('Location', 'nunique'),
+    )
+    stats['StdAmount'] = stats['StdAmount'].fillna(0.0)
+    joined = df.join(stats, on='AccountID')
+
+    std_amount = joined['StdAmount'].replace(0.0, 1.0)
+    avg_duration = joined['AvgDuration'].replace(0.0, 1.0)
+    X = pd.DataFrame({
+        'TransactionAmount': joined['TransactionAmount'],
+        'TransactionDuration': joined['TransactionDuration'],
+        'LoginAttempts': joined['LoginAttempts'],
+        'AccountBalance': joined['AccountBalance'],
+        'DaysSinceLastTransaction': (now - joined['PreviousTransactionDate']).dt.days,
+        'TransactionSpeed': joined['TransactionAmount'] / joined['TransactionDuration'].replace(0.0, np.nan),
+        'AvgAmount': joined['AvgAmount'],
+        'StdAmount': joined['StdAmount'],
+        'MaxAmount': joined['MaxAmount'],
+        'AvgDuration': joined['AvgDuration'],
+        'UniqueLocations': joined['UniqueLocations'],
+        'AmountDeviation': (joined['TransactionAmount'] - joined['AvgAmount']) / std_amount,
+        'DurationDeviation': (joined['TransactionDuration'] - joined['AvgDuration']) / avg_duration,
+        'TransactionType': (joined['TransactionType'] != 'Debit').astype(int),
+        'Location': joined['Location'].map(stable_bucket),
+        'DeviceID': joined['DeviceID'].map(stable_bucket),
+        'MerchantID': joined['MerchantID'].map(stable_bucket),
+        'Channel': joined['Channel'].map(CHANNEL_CODES).fillna(0).astype(int),
+        'CustomerOccupation': joined['CustomerOccupation'].map(OCCUPATION_CODES).fillna(0).astype(int),
+    }, columns=FEATURE_NAMES)
+    return X.astype('float64').fillna(0.0)
+
+
+# Worker-process state, set once per process by the pool initializer so the
+# training matrices are pickled to each worker once instead of once per trial
+_WORKER = {}
+
+
+def _init_worker(X_train, y_train, X_val, y_val, served_models, limits):
+    _WORKER.update(X_train=X_train, y_train=y_train, X_val=X_val, y_val=y_val, served=served_models,
+                   limits=limits)
+
+
+def _keep_newest_trees(forest, max_trees):
+    """Drop the oldest IsolationForest trees so warm starts slide a window instead of growing"""
+    drop = len(forest.estimators_) - max_trees
+    if drop <= 0:
+        return forest
+    forest.estimators_ = forest.estimators_[drop:]
+    forest.estimators_features_ = forest.estimators_features_[drop:]
+    forest._seeds = forest._seeds[drop:]
+    # Per-tree caches sklearn builds in fit and reads in score_samples
+    forest._decision_path_lengths = forest._decision_path_lengths[drop:]
+    forest._average_path_length_per_tree = forest._average_path_length_per_tree[drop:]
+    forest.set_params(n_estimators=len(forest.estimators_), warm_start=False)
+    return forest
+
+
+def _run_trial(trial):
+    """Fit one (kind, params, resource) trial in a worker and score it on validation"""
+    from sklearn.base import clone
+    from sklearn.ensemble import IsolationForest
+    from sklearn.metrics import roc_auc_score
+    from xgboost import XGBClassifier
+
+    start = time.perf_counter()
+    X_train, y_train = _WORKER['X_train'], _WORKER['y_train']
+    X_val, y_val = _WORKER['X_val'], _WORKER['y_val']
+    kind, params, resource = trial['kind'], trial['params'], trial['resource']
+
+    if kind == 'xgboost':
+        positives = max(int(y_train.sum()), 1)
+        model = XGBClassifier(n_estimators=resource, n_jobs=1, random_state=42,
+                              scale_pos_weight=(len(y_train) - positives) / positives,
+                              eval_metric='auc', **params)
+        model.fit(X_train, y_train)
+        scores = model.predict_proba(X_val)[:, 1]
+    elif kind == 'xgboost_warm':
+        # Continue boosting from the served model on the new rows only, never past the round cap
+        served = _WORKER['served']['xgboost']
+        remaining = _WORKER['limits']['max_boost_rounds'] - served.get_booster().num_boosted_rounds()
+        model = clone(served).set_params(n_estimators=max(1, min(resource, remaining)), n_jobs=1, **params)
+        model.fit(X_train, y_train, xgb_model=served.get_booster())
+        scores = model.predict_proba(X_val)[:, 1]
+    elif kind == 'isolation_forest':
+        model = IsolationForest(n_estimators=resource, contamination='auto', random_state=42,
+                                n_jobs=1, **params)
+        model.fit(X_train)
+        scores = -model.decision_function(X_val)
+    elif kind == 'isolation_forest_warm':
+        # warm_start keeps the served trees and grows extra ones on the new rows
+        served = _WORKER['served']['isolation_forest']
+        model = copy.deepcopy(served)
+        model.set_params(warm_start=True, n_estimators=served.n_estimators + resource, n_jobs=1)
+        model.fit(X_train)
+        model = _keep_newest_trees(model, _WORKER['limits']['max_forest_trees'])
+        scores = -model.decision_function(X_val)
+    else:
+        raise ValueError(f"Unknown trial kind: {kind}")
+
+    try:
+        score = float(roc_auc_score(y_val, scores))
+    except ValueError:
+        score = float('nan')
+    return {**trial, 'score': score, 'seconds': time.perf_counter() - start, 'model': model}
+
+
+class AutoMLTrainer:
+    """Successive-halving model search over XGBoost and Isolation Forest.
+
+    Trials run on a spawned process pool. The first run searches the full
+    history; later runs read only rows newer than the stored watermark and
+    warm-start from the currently served models, falling back to a full
+    search if no served model exists. Warm-started forests keep only their
+    newest ``max_forest_trees`` trees, and boosting stops at ``max_boost_rounds``
+    total; a served booster already at the cap forces a full search, so served
+    models do not grow with every run. The best model of each family is saved
+    as a pending candidate; the watermark only moves past a run's rows when
+    ``promote`` makes its candidates the served models. Per-trial and total
+    wall-clock are kept in the state file alongside the watermark.
+    """
+
+    def __init__(self, data_path, models_dir='models', state_path='models/automl/state.json',
+                 candidates_dir='models/automl/candidates', store_dir=None,
+                 max_workers=None, eta=3, min_resource=25, max_resource=400,
+                 min_new_rows=500, validation_fraction=0.2, max_forest_trees=None, max_boost_rounds=None):
+        self.data_path = data_path
+        self.models_dir = models_dir
+        self.state_path = state_path
+        self.candidates_dir = candidates_dir
+        # Mmap artifact store to export promoted models into, if serving uses one
+        self.store_dir = store_dir
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.eta = eta
+        self.min_resource = min_resource
+        self.max_resource = max_resource
+        self.min_new_rows = min_new_rows
+        self.validation_fraction = validation_fraction
+        self.max_forest_trees = max_forest_trees or max_resource
+        self.max_boost_rounds = max_boost_rounds or 2 * max_resource
+        self.last_report = None
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_state(self, state):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        with open(self.state_path + '.tmp', 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(self.state_path + '.tmp', self.state_path)
+
+    def _load_served(self):
+        served = {}
+        for name in ('xgboost', 'isolation_forest'):
+            path = os.path.join(self.models_dir, f'{name}.pkl')
+            if os.path.exists(path):
+                served[name] = joblib.load(path)
+        return served
+
+    def _temporal_split(self, df):
+        df = df.sort_values('TransactionDate', kind='stable')
+        X = build_features(df)
+        y = fraud_labels(df).astype(int)
+        split = int(len(df) * (1.0 - self.validation_fraction))
+        return X.iloc[:split], y[:split], X.iloc[split:], y[split:]
+
+    def _booster_full(self, served):
+        xgb = served.get('xgboost')
+        return xgb is not None and xgb.get_booster().num_boosted_rounds() + self.min_resource > self.max_boost_rounds
+
+    def _trials(self, incremental, served):
+        trials = []
+        if incremental and 'xgboost' in served:
+            trials += [{'kind': 'xgboost_warm', 'params': p} for p in
+                       ({'learning_rate': lr} for lr in (0.02, 0.05, 0.1))]
+        else:
+            trials += [{'kind': 'xgboost', 'params': p} for p in XGBOOST_SPACE]
+        if incremental and 'isolation_forest' in served:
+            trials.append({'kind': 'isolation_forest_warm', 'params': {}})
+        else:
+            trials += [{'kind': 'isolation_forest', 'params': p} for p in ISOLATION_FOREST_SPACE]
+        return trials
+
+    def _successive_halving(self, pool, trials):
+        """Give every trial a small budget, keep the best 1/eta of each family, multiply the budget by eta"""
+        log = []
+        resource = self.min_resource
+        survivors = trials
+        while True:
+            rung = [{**trial, 'resource': resource} for trial in survivors]
+            results = list(pool.map(_run_trial, rung))
+            for result in results:
+                log.append({k: v for k, v in result.items() if k != 'model'})
+            ranked = {}
+            for result in sorted(results, key=lambda r: -1.0 if math.isnan(r['score']) else r['score'],
+                                 reverse=True):
+                ranked.setdefault(_family(result['kind']), []).append(result)
+            if resource >= self.max_resource or all(len(r) == 1 for r in ranked.values()):
+                return {family: r[0] for family, r in ranked.items()}, log
+            survivors = [{'kind': r['kind'], 'params': r['params']}
+                         for family_results in ranked.values()
+                         for r in family_results[:max(1, math.ceil(len(family_results) / self.eta))]]
+            resource = min(resource * self.eta, self.max_resource)
+
+    def train_models(self):
+        run_start = time.perf_counter()
+        state = self._load_state()
+        served = self._load_served()
+        watermark = pd.Timestamp(state['watermark']) if state.get('watermark') else None
+        incremental = watermark is not None and bool(served) and not self._booster_full(served)
+
+        df = load_transactions(self.data_path, since=watermark if incremental else None)
+        if incremental and len(df) < self.min_new_rows:
+            self.last_report = {
+                'status': 'skipped',
+                'reason': f"only {len(df)} new rows since {watermark}",
+                'total_seconds': time.perf_counter() - run_start,
+            }
+            state['last_report'] = self.last_report
+            self._save_state(state)
+            return self.last_report
+
+        X_train, y_train, X_val, y_val = self._temporal_split(df)
+        trials = self._trials(incremental, served)
+        # spawn, not fork: forking a multithreaded caller can deadlock the workers
+        with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker,
+                                 initargs=(X_train, y_train, X_val, y_val, served, {
+                                     'max_forest_trees': self.max_forest_trees,
+                                     'max_boost_rounds': self.max_boost_rounds,
+                                 })) as pool:
+            best, log = self._successive_halving(pool, trials)
+
+        stamp = datetime.now().strftime('%Y%m%d%H%M%S')
+        os.makedirs(self.candidates_dir, exist_ok=True)
+        candidates = {}
+        for family, result in best.items():
+            candidates[family] = os.path.join(self.candidates_dir, f'{family}-{stamp}.pkl')
+            joblib.dump(result['model'], candidates[family])
+
+        total_seconds = time.perf_counter() - run_start
+        self.last_report = {
+            'status': 'success',
+            'mode': 'incremental' if incremental else 'full',
+            'rows': len(df),
+            # Weak labels are built from LoginAttempts, TransactionAmount and AccountBalance,
+            # which are also features, so their AUCs are optimistic
+            'labels': 'ground_truth' if 'IsFraud' in df.columns else 'weak',
+            'best': {family: {k: v for k, v in result.items() if k != 'model'}
+                     for family, result in best.items()},
+            'candidates': candidates,
+            'trials': log,
+            'trial_seconds': sum(t['seconds'] for t in log),
+            'total_seconds': total_seconds,
+        }
+        state.update({
+            'pending': {'watermark': df['TransactionDate'].max().isoformat(), 'candidates': candidates},
+            'last_run': datetime.now().isoformat(),
+            'last_report': self.last_report,
+        })
+        self._save_state(state)
+        return self.last_report
+
+    def report(self):
+        """Report of the last run, from the state file so it survives the training process"""
+        return self._load_state().get('last_report')
+
+    def _rebuild_explainer(self, xgb_model):
+        """Refit the SHAP explainer on a promoted XGBoost; None if shap is not installed"""
+        try:
+            import shap
+        except ImportError:
+            return None
+        explainer = shap.TreeExplainer(xgb_model)
+        path = os.path.join(self.models_dir, 'shap_explainer.pkl')
+        joblib.dump(explainer, path + '.tmp')
+        os.replace(path + '.tmp', path)
+        if self.store_dir is not None:
+            from models.artifact_store import export_shap_explainer
+            export_shap_explainer(explainer, self.store_dir)
+        return path
+
+    def explainer_stale(self):
+        """True once an XGBoost was promoted without rebuilding the SHAP explainer"""
+        return bool(self._load_state().get('shap_explainer_stale'))
+
+    def promote(self):
+        """Serve the pending candidates and advance the watermark past the rows they saw.
+
+        Returns the promoted model paths, the candidate files they came from
+        and the rebuilt SHAP explainer path, if the XGBoost changed.
+        """
+        state = self._load_state()
+        pending = state.get('pending')
+        if not pending:
+            raise ValueError("No pending candidates to promote")
+
+        promoted, explainer_path = {}, None
+        for family, path in pending['candidates'].items():
+            model = joblib.load(path)
+            target = os.path.join(self.models_dir, f'{family}.pkl')
+            joblib.dump(model, target + '.tmp')
+            os.replace(target + '.tmp', target)
+            if self.store_dir is not None:
+                from models.artifact_store import export_isolation_forest, export_xgboost
+                exporter = export_xgboost if family == 'xgboost' else export_isolation_forest
+                exporter(model, self.store_dir)
+            promoted[family] = target
+            if family == 'xgboost':
+                explainer_path = self._rebuild_explainer(model)
+                # Explanations of the old booster would be wrong, not just imprecise
+                state['shap_explainer_stale'] = explainer_path is None
+
+        state['watermark'] = pending['watermark']
+        state['last_promoted'] = {'at': datetime.now().isoformat(), 'models': promoted}
+        del state['pending']
+        self._save_state(state)
+        return {'models': promoted, 'candidates': pending['candidates'], 'shap_explainer': explainer_path}
+
+
+if __name__ == '__main__':
+    # Run from a fresh interpreter by the app, so training never forks the web server
+    data_path = sys.argv[1] if len(sys.argv) > 1 else 'data/bank_transactions_data_2.csv'
+    report = AutoMLTrainer(data_path).train_models()
+    print(json.dumps({k: v for k, v in report.items() if k != 'trials'}, indent=2, default=str))
@@ -1,3 +1,4 @@
+import atexit
 import pandas as pd
 from datetime import datetime
 from typing import Dict, Any
@@ -11,8 +12,11 @@ class CustomerRiskProfiler:
                 self.profiles = json.load(f)
         except FileNotFoundError:
             self.profiles = {}
+        self.dirty = False
+        # Write out updates deferred under load if the process stops before the next save
+        atexit.register(self.flush)
     
-    def update_profile(self, customer_id: str, transaction: Dict[str, Any]):
+    def update_profile(self, customer_id: str, transaction: Dict[str, Any], persist: bool = True):
         if customer_id not in self.profiles:
             self.profiles[customer_id] = {
                 "first_seen": datetime.now().isoformat(),
@@ -40,7 +44,11 @@ class CustomerRiskProfiler:
         
         profile['risk_score'] = min(0.9, 0.3 + amount_deviation * 0.4 + freq_deviation * 0.3)
         
-        self._save_profiles()
+        # Under load the rewrite is deferred; the next persisted update writes everything
+        if persist:
+            self._save_profiles()
+        else:
+            self.dirty = True
     
     def _calculate_amount_deviation(self, customer_id, amount):
         """Calculate deviation from customer's typical transaction amount"""
@@ -53,9 +61,15 @@ class CustomerRiskProfiler:
         # Implement actual frequency analysis
         return 0.5  # Placeholder
     
+    def flush(self):
+        """Write the profiles if any update skipped its save"""
+        if self.dirty:
+            self._save_profiles()
+
     def _save_profiles(self):
         with open(self.storage_path, 'w') as f:
             json.dump(self.profiles, f)
+        self.dirty = False
     
     def get_risk_profile(self, customer_id):
         return self.profiles.get(customer_id, None)
\ No newline at end of file
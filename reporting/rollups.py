@@ -0,0 +1,145 @@
+import math
+import os
+import threading
+from datetime import datetime, timedelta
+
+# Bucket width in seconds and how many buckets each resolution keeps
+RESOLUTIONS = {
+    'minute': (60, 180),
+    'hour': (3600, 72),
+    'day': (86400, 62),
+}
+# Dashboard range -> (resolution, number of buckets returned)
+RANGES = {
+    '1h': ('minute', 60),
+    '24h': ('hour', 24),
+    '7d': ('day', 7),
+    '30d': ('day', 30),
+}
+NUM_RISK_BINS = 10
+HIGH_RISK_THRESHOLD = 0.7
+
+# Naive local epoch, so day buckets start at local midnight
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _risk_bin(score):
+    # Right-closed bins, so 0.4 and 0.7 land on the same side as the dashboard's > checks
+    index = math.ceil(score * NUM_RISK_BINS) - 1
+    return min(max(index, 0), NUM_RISK_BINS - 1)
+
+
+class _Ring:
+    """Fixed number of time buckets in a ring; a slot is reset when a newer bucket claims it"""
+
+    def __init__(self, width, capacity):
+        self.width = width
+        self.capacity = capacity
+        self.keys = [None] * capacity
+        self.count = [0] * capacity
+        self.flagged = [0] * capacity
+        self.high_risk = [0] * capacity
+        self.amount = [0.0] * capacity
+        self.risk_sum = [0.0] * capacity
+        self.histogram = [[0] * NUM_RISK_BINS for _ in range(capacity)]
+
+    def record(self, seconds, amount, risk, flagged, risk_bin):
+        key = int(seconds // self.width)
+        slot = key % self.capacity
+        current = self.keys[slot]
+        if current != key:
+            if current is not None and current > key:
+                # Older than anything this ring still keeps
+                return
+            self.keys[slot] = key
+            self.count[slot] = 0
+            self.flagged[slot] = 0
+            self.high_risk[slot] = 0
+            self.amount[slot] = 0.0
+            self.risk_sum[slot] = 0.0
+            self.histogram[slot] = [0] * NUM_RISK_BINS
+        self.count[slot] += 1
+        self.flagged[slot] += flagged
+        self.high_risk[slot] += risk > HIGH_RISK_THRESHOLD
+        self.amount[slot] += amount
+        self.risk_sum[slot] += risk
+        self.histogram[slot][risk_bin] += 1
+
+    def window(self, last_key, length):
+        """Series for the ``length`` buckets ending at ``last_key``, plus range totals"""
+        series = {'count': [], 'flagged': [], 'high_risk': [], 'amount': [], 'avg_risk': []}
+        histogram = [0] * NUM_RISK_BINS
+        amount_total = risk_total = 0.0
+        for key in range(last_key - length + 1, last_key + 1):
+            slot = key % self.capacity
+            live = self.keys[slot] == key
+            count = self.count[slot] if live else 0
+            series['count'].append(count)
+            series['flagged'].append(self.flagged[slot] if live else 0)
+            series['high_risk'].append(self.high_risk[slot] if live else 0)
+            series['amount'].append(round(self.amount[slot], 2) if live else 0.0)
+            series['avg_risk'].append(round(self.risk_sum[slot] / count, 3) if count else None)
+            if count:
+                amount_total += self.amount[slot]
+                risk_total += self.risk_sum[slot]
+                histogram = [a + b for a, b in zip(histogram, self.histogram[slot])]
+        return series, histogram, amount_total, risk_total
+
+
+class RollupStore:
+    """Per-minute, hour and day dashboard aggregates, updated in O(1) per transaction.
+
+    Each resolution is a fixed ring of buckets, so memory and the size of a
+    ``stats`` answer depend only on the range asked for, never on volume.
+    Buckets are keyed on when the server scored a transaction, never on the
+    client-supplied TransactionDate: a replayed or future-dated payload must
+    not claim a slot ahead of live traffic. Counts are per process.
+    """
+
+    def __init__(self, resolutions=RESOLUTIONS):
+        self.rings = {name: _Ring(width, capacity) for name, (width, capacity) in resolutions.items()}
+        self._lock = threading.Lock()
+
+    def record(self, amount, risk, flagged, scored_at=None):
+        now = datetime.now()
+        # Clock skew between workers sharing an event log must not create future buckets
+        scored_at = now if scored_at is None else min(scored_at, now)
+        seconds = (scored_at - _EPOCH).total_seconds()
+        risk = float(risk)
+        risk_bin = _risk_bin(risk)
+        with self._lock:
+            for ring in self.rings.values():
+                ring.record(seconds, float(amount), risk, bool(flagged), risk_bin)
+
+    def backfill(self, scored_at, amounts, risks, statuses):
+        for timestamp, amount, risk, status in zip(scored_at, amounts, risks, statuses):
+            if timestamp is not None and risk is not None:
+                self.record(amount or 0.0, risk, status == 'Flagged', scored_at=timestamp)
+
+    def stats(self, range_name='24h', now=None):
+        if range_name not in RANGES:
+            raise ValueError(f"range must be one of {', '.join(RANGES)}")
+        resolution, length = RANGES[range_name]
+        ring = self.rings[resolution]
+        now = now or datetime.now()
+        last_key = int((now - _EPOCH).total_seconds() // ring.width)
+        with self._lock:
+            series, histogram, amount_total, risk_total = ring.window(last_key, length)
+
+        count = sum(series['count'])
+        return {
+            'range': range_name,
+            'pid': os.getpid(),
+            'resolution': resolution,
+            'step_seconds': ring.width,
+            'start': (_EPOCH + timedelta(seconds=(last_key - length + 1) * ring.width)).strftime("%Y-%m-%d %H:%M:%S"),
+            'totals': {
+                'count': count,
+                'flagged': sum(series['flagged']),
+                'high_risk': sum(series['high_risk']),
+                'amount': round(amount_total, 2),
+                'avg_risk': round(risk_total / count, 3) if count else None,
+            },
+            'series': series,
+            'risk_histogram': histogram,
+        }
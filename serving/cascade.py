@@ -0,0 +1,232 @@
+import json
+import os
+import random
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class FirstStageTree:
+    """Shallow regression tree distilled from the full ensemble's score.
+
+    ``target`` names what the leaves predict. ``'base_score'`` is the model
+    average before the customer-risk multiplier, which is not a feature and
+    is applied at serve time instead.
+
+    Kept as plain Python lists: for one row a handful of comparisons is far
+    cheaper than any numpy or sklearn call.
+    """
+
+    def __init__(self, children_left, children_right, feature, threshold, value, feature_names=None,
+                 target='composite_score'):
+        self.children_left = list(children_left)
+        self.children_right = list(children_right)
+        self.feature = list(feature)
+        self.threshold = list(threshold)
+        self.value = list(value)
+        self.feature_names = list(feature_names or [])
+        self.target = target
+
+    @classmethod
+    def from_sklearn(cls, tree_model, feature_names=None, target='base_score'):
+        tree = tree_model.tree_
+        return cls(tree.children_left.tolist(), tree.children_right.tolist(),
+                   tree.feature.tolist(), tree.threshold.tolist(),
+                   tree.value[:, 0, 0].tolist(), feature_names, target)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(**json.load(f))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({
+                'children_left': self.children_left,
+                'children_right': self.children_right,
+                'feature': self.feature,
+                'threshold': self.threshold,
+                'value': self.value,
+                'feature_names': self.feature_names,
+                'target': self.target,
+            }, f)
+        os.replace(path + '.tmp', path)
+
+    def score(self, row):
+        left, right = self.children_left, self.children_right
+        node = 0
+        while left[node] != -1:
+            node = left[node] if row[self.feature[node]] <= self.threshold[node] else right[node]
+        return self.value[node]
+
+
+def distill_first_stage(X, teacher_scores, max_depth=4, min_samples_leaf=50, feature_names=None,
+                        sample_weight=None):
+    from sklearn.tree import DecisionTreeRegressor
+
+    model = DecisionTreeRegressor(max_depth=max_depth, min_samples_leaf=min_samples_leaf, random_state=42)
+    model.fit(np.asarray(X, dtype=np.float64), np.asarray(teacher_scores, dtype=np.float64),
+              sample_weight=sample_weight)
+    return FirstStageTree.from_sklearn(model, feature_names)
+
+
+class CascadeScorer:
+    """Routes transactions between a cheap first stage and the full ensemble.
+
+    First-stage scores below ``low`` settle as legitimate and above ``high``
+    settle as suspicious; only the band in between pays for the full
+    ensemble, GNN and SHAP. A small ``audit_rate`` of settled transactions
+    is also run through the full ensemble so that agreement and recall of
+    the band can be estimated.
+
+    The tree predicts the pre-multiplier base score; callers pass the
+    customer-risk ``multiplier`` to ``route`` so thresholds apply to the same
+    scale as the ensemble's composite score.
+    """
+
+    def __init__(self, first_stage=None, low=0.3, high=0.9, flag_threshold=0.7,
+                 audit_rate=0.02, num_bins=20, sample_buffer=20000):
+        self.first_stage = first_stage
+        self.low = low
+        self.high = high
+        self.flag_threshold = flag_threshold
+        self.audit_rate = audit_rate
+        self.bins = np.linspace(0.0, 1.0, num_bins + 1)
+        # Feature rows with their full-ensemble base score and sampling weight,
+        # used to (re)distill the first stage
+        self.samples = deque(maxlen=sample_buffer)
+        self._lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.tier_counts = {'settled_low': 0, 'settled_high': 0, 'escalated': 0, 'no_first_stage': 0}
+        self.audited = {'settled_low': 0, 'settled_high': 0}
+        self.audited_flagged = {'settled_low': 0, 'settled_high': 0}
+        self.escalated_flagged = 0
+        self.compared = 0
+        self.agreements = 0
+        self.abs_diff_sum = 0.0
+        # First-stage score mass of transactions the full ensemble flags, weighted
+        # by inverse sampling rate; drives the recall-vs-low-threshold estimate
+        self.flagged_histogram = np.zeros(len(self.bins) - 1, dtype=np.float64)
+
+    def route(self, row, multiplier=1.0):
+        """Return (tier, first_stage_score, audit) for one feature row"""
+        if self.first_stage is None:
+            with self._lock:
+                self.tier_counts['no_first_stage'] += 1
+            return 'escalated', None, False
+
+        score = self.first_stage.score(row) * multiplier
+        if score < self.low:
+            tier = 'settled_low'
+        elif score > self.high:
+            tier = 'settled_high'
+        else:
+            tier = 'escalated'
+        audit = tier != 'escalated' and random.random() < self.audit_rate
+        with self._lock:
+            self.tier_counts[tier] += 1
+        return tier, score, audit
+
+    def record_full(self, row, tier, first_stage_score, full_score, target=None):
+        """Record a full-ensemble result for an escalated or audited transaction.
+
+        ``target`` is what the first stage is distilled on, the base score
+        before the customer-risk multiplier; it defaults to ``full_score``.
+        """
+        flagged = full_score > self.flag_threshold
+        # Audited rows stand in for every settled row they were sampled from
+        audited = tier != 'escalated'
+        weight = 1.0 / self.audit_rate if audited and self.audit_rate > 0 else 1.0
+        target = full_score if target is None else target
+        with self._lock:
+            self.samples.append((np.array(row, dtype=np.float64), float(target), weight))
+            if first_stage_score is None:
+                return
+            if audited:
+                self.audited[tier] += 1
+                self.audited_flagged[tier] += flagged
+            else:
+                self.escalated_flagged += flagged
+            self.compared += 1
+            self.agreements += (first_stage_score > self.flag_threshold) == flagged
+            self.abs_diff_sum += abs(first_stage_score - full_score)
+            if flagged:
+                index = int(np.clip(np.searchsorted(self.bins, first_stage_score, side='right') - 1,
+                                    0, len(self.bins) - 2))
+                self.flagged_histogram[index] += weight
+
+    def distill(self, max_depth=4, min_samples=1000, feature_names=None):
+        with self._lock:
+            samples = list(self.samples)
+        if len(samples) < min_samples:
+            raise ValueError(f"Need at least {min_samples} full-ensemble samples, have {len(samples)}")
+        X = np.stack([row for row, _, _ in samples])
+        y = np.array([score for _, score, _ in samples])
+        weights = np.array([weight for _, _, weight in samples])
+        first_stage = distill_first_stage(X, y, max_depth=max_depth, feature_names=feature_names,
+                                          sample_weight=weights)
+        with self._lock:
+            self.first_stage = first_stage
+            self._reset_stats()
+        return first_stage
+
+    def set_band(self, low=None, high=None):
+        """Move either bound; raises ValueError unless 0 <= low <= high <= 1"""
+        with self._lock:
+            bounds = []
+            for name, value, current in (('low', low, self.low), ('high', high, self.high)):
+                if value is None:
+                    bounds.append(current)
+                    continue
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    raise ValueError(f"{name} must be a number")
+                bounds.append(float(value))
+            low, high = bounds
+            if not 0.0 <= low <= high <= 1.0:
+                raise ValueError(f"Band must satisfy 0 <= low <= high <= 1, got low={low}, high={high}")
+            self.low, self.high = low, high
+
+    def _estimated_flagged(self, tier):
+        audited = self.audited[tier]
+        if not audited:
+            return None
+        return self.audited_flagged[tier] / audited * self.tier_counts[tier]
+
+    def report(self):
+        with self._lock:
+            total = sum(self.tier_counts.values())
+            missed_low = self._estimated_flagged('settled_low')
+            caught_high = self._estimated_flagged('settled_high')
+            recall = None
+            if missed_low is not None:
+                caught = self.escalated_flagged + (caught_high or 0.0)
+                if caught + missed_low > 0:
+                    recall = caught / (caught + missed_low)
+
+            flagged_mass = self.flagged_histogram.sum()
+            recall_by_low = None
+            if flagged_mass > 0:
+                # Fraction of flagged mass whose first-stage score is at or above each bin edge
+                tail = np.cumsum(self.flagged_histogram[::-1])[::-1] / flagged_mass
+                recall_by_low = {f"{edge:.2f}": float(r) for edge, r in zip(self.bins[:-1], tail)}
+
+            return {
+                'enabled': self.first_stage is not None,
+                'band': {'low': self.low, 'high': self.high},
+                'flag_threshold': self.flag_threshold,
+                'audit_rate': self.audit_rate,
+                'total': total,
+                'tier_counts': dict(self.tier_counts),
+                'tier_rates': {k: (v / total if total else 0.0) for k, v in self.tier_counts.items()},
+                'audited': dict(self.audited),
+                'audited_flagged': dict(self.audited_flagged),
+                'agreement': self.agreements / self.compared if self.compared else None,
+                'mean_abs_diff': self.abs_diff_sum / self.compared if self.compared else None,
+                'estimated_recall': recall,
+                'recall_by_low_threshold': recall_by_low,
+                'distillation_samples': len(self.samples),
+            }
@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Optional stages in the order they are switched off under load. The last one
+# drops Isolation Forest so scoring falls back to the cheaper models.
+SHED_ORDER = ('shap', 'gnn', 'drift', 'profile_write', 'ensemble')
+
+
+class RequestPlan:
+    """The stages one request may run, fixed when the request starts"""
+
+    def __init__(self, controller, skipped):
+        self.controller = controller
+        self.skipped = skipped
+
+    def runs(self, stage):
+        return stage not in self.skipped
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.controller.record_stage(name, (time.perf_counter() - start) * 1000.0)
+
+
+class DegradationController:
+    """Sheds optional analyze stages when latency or concurrency breaks the SLO.
+
+    Each check compares the p95 of requests completed since the previous check
+    and the in-flight count with the SLO, so a past spike never outweighs
+    current traffic. Over budget, the next stage in
+    ``SHED_ORDER`` is switched off. A stage is switched back on only after
+    ``recover_checks`` consecutive checks where p95 plus that stage's last
+    measured cost stays under ``recover_ratio`` of the SLO, so the controller
+    does not flap around the threshold; ``on_restore`` is then called with the
+    stage's name, outside the lock. With ``enabled=False`` latencies are
+    still measured and reported but nothing is shed.
+    """
+
+    def __init__(self, slo_ms=250.0, max_inflight=32, stages=SHED_ORDER, window=500,
+                 min_samples=20, check_interval=1.0, recover_ratio=0.6, recover_checks=3,
+                 stage_alpha=0.1, enabled=True, on_restore=None):
+        self.enabled = enabled
+        self.on_restore = on_restore
+        self.slo_ms = slo_ms
+        self.max_inflight = max_inflight
+        self.stages = tuple(stages)
+        self.min_samples = min_samples
+        self.check_interval = check_interval
+        self.recover_ratio = recover_ratio
+        self.recover_checks = recover_checks
+        self.stage_alpha = stage_alpha
+        self.level = 0
+        self.inflight = 0
+        self.calm_checks = 0
+        self.transitions = 0
+        self.stage_ms = {}
+        # Samples since the last check, capped so a long gap between checks stays cheap
+        self.latencies = deque(maxlen=window)
+        self.shed_counts = {stage: 0 for stage in self.stages}
+        self.last_p95 = None
+        self._last_check = time.monotonic()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def request(self):
+        with self._lock:
+            self.inflight += 1
+            skipped = self.stages[:self.level]
+            for stage in skipped:
+                self.shed_counts[stage] += 1
+        plan = RequestPlan(self, skipped)
+        start = time.perf_counter()
+        try:
+            yield plan
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            with self._lock:
+                self.inflight -= 1
+                self.latencies.append(elapsed_ms)
+                restored = self._maybe_check()
+            if restored is not None and self.on_restore is not None:
+                self.on_restore(restored)
+
+    def record_stage(self, name, ms):
+        with self._lock:
+            previous = self.stage_ms.get(name)
+            self.stage_ms[name] = ms if previous is None else previous + self.stage_alpha * (ms - previous)
+
+    def _maybe_check(self):
+        """Run a check if one is due; returns the stage switched back on, if any"""
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        overloaded = self.inflight > self.max_inflight
+        if len(self.latencies) < self.min_samples and not overloaded:
+            return
+        self._last_check = now
+
+        ordered = sorted(self.latencies)
+        self.latencies.clear()
+        p95 = ordered[int(0.95 * (len(ordered) - 1))] if ordered else 0.0
+        self.last_p95 = p95
+        if not self.enabled:
+            return
+        if p95 > self.slo_ms or overloaded:
+            self.calm_checks = 0
+            if self.level < len(self.stages):
+                self._set_level(self.level + 1)
+            return
+
+        if self.level == 0:
+            return
+        restored = self.stages[self.level - 1]
+        budget = self.slo_ms * self.recover_ratio
+        if p95 + self.stage_ms.get(restored, 0.0) < budget and self.inflight <= self.max_inflight // 2:
+            self.calm_checks += 1
+            if self.calm_checks >= self.recover_checks:
+                self._set_level(self.level - 1)
+                return restored
+        else:
+            self.calm_checks = 0
+
+    def _set_level(self, level):
+        self.level = level
+        self.calm_checks = 0
+        self.transitions += 1
+
+    def report(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'slo_ms': self.slo_ms,
+                'max_inflight': self.max_inflight,
+                'level': self.level,
+                'skipped_stages': list(self.stages[:self.level]),
+                'inflight': self.inflight,
+                'p95_ms': self.last_p95,
+                'transitions': self.transitions,
+                'stage_ms': dict(self.stage_ms),
+                'shed_counts': dict(self.shed_counts),
+            }
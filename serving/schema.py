@@ -0,0 +1,195 @@
+import json
+import math
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FEATURE_NAMES = ['TransactionAmount', 'TransactionDuration', 'LoginAttempts',
+                 'AccountBalance', 'DaysSinceLastTransaction', 'TransactionSpeed',
+                 'AvgAmount', 'StdAmount', 'MaxAmount', 'AvgDuration', 'UniqueLocations',
+                 'AmountDeviation', 'DurationDeviation', 'TransactionType',
+                 'Location', 'DeviceID', 'MerchantID', 'Channel', 'CustomerOccupation']
+
+CHANNEL_CODES = {'ATM': 0, 'Online': 1, 'Branch': 2}
+OCCUPATION_CODES = {'Student': 0, 'Doctor': 1, 'Engineer': 2, 'Retired': 3}
+
+
+def stable_bucket(value, buckets=100):
+    # hash() is salted per process, so training and every worker would disagree
+    return zlib.crc32(str(value).encode()) % buckets
+
+
+class SchemaError(ValueError):
+    def __init__(self, field, message):
+        super().__init__(f"{field}: {message}")
+        self.field = field
+        self.message = message
+
+
+def parse_timestamp(value):
+    """Parse 'YYYY-MM-DD HH:MM:SS' by slicing, falling back to ISO 8601"""
+    if isinstance(value, str) and len(value) == 19 and value[4] == '-' and value[7] == '-' \
+            and value[10] in ' T' and value[13] == ':' and value[16] == ':':
+        try:
+            return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                            int(value[11:13]), int(value[14:16]), int(value[17:19]))
+        except ValueError:
+            pass
+    if isinstance(value, str):
+        try:
+            # Browsers send toISOString() values such as 2024-01-15T14:30:00.000Z
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+        except ValueError:
+            pass
+    raise ValueError("expected a 'YYYY-MM-DD HH:MM:SS' timestamp")
+
+
+def _to_float(value):
+    if isinstance(value, bool):
+        raise ValueError("expected a number")
+    result = float(value)
+    if not math.isfinite(result):
+        raise ValueError("expected a finite number")
+    return result
+
+
+def _to_int(value):
+    if isinstance(value, bool):
+        raise ValueError("expected an integer")
+    result = float(value)
+    if not result.is_integer():
+        raise ValueError("expected an integer")
+    return int(result)
+
+
+def _to_str(value):
+    if not isinstance(value, (str, int)) or isinstance(value, bool):
+        raise ValueError("expected a string")
+    return str(value)
+
+
+def _positive(converter):
+    def convert(value):
+        result = converter(value)
+        if result <= 0:
+            raise ValueError("must be greater than zero")
+        return result
+    return convert
+
+
+def _non_negative(converter):
+    def convert(value):
+        result = converter(value)
+        if result < 0:
+            raise ValueError("must not be negative")
+        return result
+    return convert
+
+
+# (field, converter, default); a default of _REQUIRED marks a mandatory field
+_REQUIRED = object()
+TRANSACTION_FIELDS = (
+    ('AccountID', _to_str, _REQUIRED),
+    ('TransactionAmount', _non_negative(_to_float), _REQUIRED),
+    ('TransactionType', _to_str, _REQUIRED),
+    ('TransactionDuration', _positive(_to_float), _REQUIRED),
+    ('LoginAttempts', _non_negative(_to_int), _REQUIRED),
+    ('AccountBalance', _to_float, _REQUIRED),
+    ('PreviousTransactionDate', parse_timestamp, _REQUIRED),
+    ('Location', _to_str, _REQUIRED),
+    ('DeviceID', _to_str, _REQUIRED),
+    ('MerchantID', _to_str, _REQUIRED),
+    ('TransactionDate', parse_timestamp, None),
+    ('TransactionID', _to_str, None),
+    ('Channel', _to_str, ''),
+    ('CustomerOccupation', _to_str, ''),
+)
+
+
+class TransactionSchema:
+    """Validates a transaction payload and writes the model feature row in one pass"""
+
+    def __init__(self, feature_names, fields=TRANSACTION_FIELDS):
+        self.fields = fields
+        self.feature_names = list(feature_names)
+        # Resolve feature positions once instead of building a dict per request
+        self.index = {name: i for i, name in enumerate(self.feature_names)}
+        self.num_features = len(self.feature_names)
+
+    def parse(self, payload):
+        if not isinstance(payload, dict):
+            raise SchemaError('body', "expected a JSON object")
+        parsed = {}
+        for name, converter, default in self.fields:
+            value = payload.get(name)
+            if value is None or value == '':
+                if default is _REQUIRED:
+                    raise SchemaError(name, "is required")
+                parsed[name] = default
+                continue
+            try:
+                parsed[name] = converter(value)
+            except (TypeError, ValueError) as e:
+                raise SchemaError(name, str(e) or "invalid value")
+            except OverflowError:
+                # Integer literals too large for a float, e.g. 1e400 written out in full
+                raise SchemaError(name, "number out of range")
+        if parsed['TransactionDate'] is None:
+            parsed['TransactionDate'] = datetime.now().replace(microsecond=0)
+        return parsed
+
+    def feature_row(self, parsed, cust_stats, now=None):
+        now = now or datetime.now()
+        amount = parsed['TransactionAmount']
+        duration = parsed['TransactionDuration']
+        avg_amount = cust_stats['AvgAmount']
+        std_amount = cust_stats['StdAmount'] or 1.0
+        avg_duration = cust_stats['AvgDuration'] or 1.0
+
+        i = self.index
+        row = np.empty(self.num_features, dtype=np.float64)
+        row[i['TransactionAmount']] = amount
+        row[i['TransactionDuration']] = duration
+        row[i['LoginAttempts']] = parsed['LoginAttempts']
+        row[i['AccountBalance']] = parsed['AccountBalance']
+        row[i['DaysSinceLastTransaction']] = (now - parsed['PreviousTransactionDate']).days
+        row[i['TransactionSpeed']] = amount / duration
+        row[i['AvgAmount']] = avg_amount
+        row[i['StdAmount']] = cust_stats['StdAmount']
+        row[i['MaxAmount']] = cust_stats['MaxAmount']
+        row[i['AvgDuration']] = cust_stats['AvgDuration']
+        row[i['UniqueLocations']] = cust_stats['UniqueLocations']
+        row[i['AmountDeviation']] = (amount - avg_amount) / std_amount
+        row[i['DurationDeviation']] = (duration - cust_stats['AvgDuration']) / avg_duration
+        row[i['TransactionType']] = 0 if parsed['TransactionType'] == 'Debit' else 1
+        row[i['Location']] = stable_bucket(parsed['Location'])
+        row[i['DeviceID']] = stable_bucket(parsed['DeviceID'])
+        row[i['MerchantID']] = stable_bucket(parsed['MerchantID'])
+        row[i['Channel']] = CHANNEL_CODES.get(parsed['Channel'], 0)
+        row[i['CustomerOccupation']] = OCCUPATION_CODES.get(parsed['CustomerOccupation'], 0)
+        return row
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """Serialize to JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_json_default).encode()
@@ -0,0 +1,225 @@
+import queue
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+# Weights of the primary ensemble's composite score
+DEFAULT_WEIGHTS = {'isolation_forest': 0.4, 'xgboost': 0.4, 'gnn': 0.2}
+
+
+def _composite(components, weights):
+    base = sum(components[key] * weight for key, weight in weights.items())
+    return base * (0.5 + components['customer_risk'])
+
+SHADOW_LOG_SCHEMA = [
+    ('timestamp', 'timestamp[us]'),
+    ('transaction_id', 'string'),
+    ('account_id', 'string'),
+    ('candidate', 'string'),
+    ('score', 'float64'),
+    ('primary_score', 'float64'),
+    ('latency_ms', 'float64'),
+]
+
+
+class ModelCandidate:
+    """Scores the feature row with an alternative IF, XGBoost or GNN model.
+
+    The candidate's output replaces the primary component of the same kind
+    and the composite is recomputed, so agreement and score differences are
+    measured on the same scale and threshold as the primary decision.
+    GNN candidates need the serving ``graph_builder``; the request only
+    passes its account node, and the graph is read when the candidate runs.
+    """
+
+    def __init__(self, name, model, kind, graph_builder=None):
+        if kind not in ('isolation_forest', 'xgboost', 'gnn'):
+            raise ValueError(f"Unknown candidate kind: {kind}")
+        if kind == 'gnn' and graph_builder is None:
+            raise ValueError("GNN candidates need the serving graph builder")
+        self.name = name
+        self.model = model
+        self.kind = kind
+        self.graph_builder = graph_builder
+
+    def score(self, context):
+        components = dict(context['components'])
+        components[self.kind] = self.component_score(context)
+        return _composite(components, DEFAULT_WEIGHTS)
+
+    def component_score(self, context):
+        if self.kind == 'isolation_forest':
+            return float(-self.model.decision_function(context['X'])[0])
+        if self.kind == 'xgboost':
+            return float(self.model.predict_proba(context['X'])[0, 1])
+
+        import torch
+        account_index = context.get('graph_account')
+        if account_index is None:
+            raise ValueError("No graph account node available for GNN candidate")
+        graph_data = self.graph_builder.to_data(account_index)
+        with torch.no_grad():
+            node_probs = self.model.node_probabilities(graph_data.x, graph_data.edge_index)
+        return float(node_probs[graph_data.account_index].item())
+
+
+class EnsembleCandidate:
+    """Recombines the primary component scores with different ensemble weights"""
+
+    def __init__(self, name, weights):
+        self.name = name
+        self.weights = {key: float(weights.get(key, default)) for key, default in DEFAULT_WEIGHTS.items()}
+
+    def score(self, context):
+        return _composite(context['components'], self.weights)
+
+
+class _CandidateStats:
+    def __init__(self, bins, threshold, latency_window):
+        self.bins = bins
+        self.threshold = threshold
+        self.count = 0
+        self.errors = 0
+        self.agreements = 0
+        self.abs_diff_sum = 0.0
+        self.histogram = np.zeros(len(bins) - 1, dtype=np.int64)
+        self.latencies = deque(maxlen=latency_window)
+
+    def record(self, score, primary_score, latency_ms):
+        self.count += 1
+        self.agreements += (score >= self.threshold) == (primary_score >= self.threshold)
+        self.abs_diff_sum += abs(score - primary_score)
+        self.histogram[_bin_index(self.bins, score)] += 1
+        self.latencies.append(latency_ms)
+
+    def summary(self):
+        latencies = np.asarray(self.latencies) if self.latencies else np.zeros(1)
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'agreement': self.agreements / self.count if self.count else None,
+            'mean_abs_diff': self.abs_diff_sum / self.count if self.count else None,
+            'histogram': self.histogram.tolist(),
+            'latency_ms': {
+                'p50': float(np.percentile(latencies, 50)),
+                'p99': float(np.percentile(latencies, 99)),
+                'max': float(latencies.max()),
+            },
+        }
+
+
+def _bin_index(bins, score):
+    return int(np.clip(np.searchsorted(bins, score, side='right') - 1, 0, len(bins) - 2))
+
+
+class ShadowScorer:
+    """Scores a sample of live traffic with candidate models off the request path.
+
+    ``submit`` only samples and enqueues, so the primary request never waits on
+    a candidate. The worker thread runs under a CPU duty-cycle budget and the
+    queue is bounded, so a slow candidate drops samples instead of stealing
+    time from primary requests.
+    """
+
+    def __init__(self, sample_rate=0.1, threshold=0.7, max_queue=1000,
+                 cpu_budget=0.25, log_writer=None, num_bins=20, latency_window=2000):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.cpu_budget = cpu_budget
+        self.log_writer = log_writer
+        self.bins = np.linspace(0.0, max(1.0, threshold * 2), num_bins + 1)
+        self.bins[-1] = np.inf
+        self.latency_window = latency_window
+        self.candidates = {}
+        self.stats = {}
+        self.primary_histogram = np.zeros(num_bins, dtype=np.int64)
+        self.submitted = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def register(self, candidate):
+        with self._lock:
+            self.candidates[candidate.name] = candidate
+            self.stats[candidate.name] = _CandidateStats(self.bins, self.threshold, self.latency_window)
+
+    def has_kind(self, kind):
+        with self._lock:
+            return any(getattr(candidate, 'kind', None) == kind for candidate in self.candidates.values())
+
+    def remove(self, name):
+        with self._lock:
+            self.candidates.pop(name, None)
+            self.stats.pop(name, None)
+
+    def submit(self, transaction, context, primary_score):
+        if not self.candidates or random.random() >= self.sample_rate:
+            return False
+        try:
+            self._queue.put_nowait((transaction, context, primary_score))
+            self.submitted += 1
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            transaction, context, primary_score = self._queue.get()
+            busy_start = time.perf_counter()
+            self._score_all(transaction, context, primary_score)
+            busy = time.perf_counter() - busy_start
+            # Sleep long enough that the worker stays under its share of one core
+            if self.cpu_budget < 1.0:
+                time.sleep(busy * (1.0 - self.cpu_budget) / self.cpu_budget)
+
+    def _score_all(self, transaction, context, primary_score):
+        with self._lock:
+            candidates = list(self.candidates.values())
+            self.primary_histogram[_bin_index(self.bins, primary_score)] += 1
+
+        timestamp = datetime.now()
+        for candidate in candidates:
+            start = time.perf_counter()
+            try:
+                score = float(candidate.score(context))
+            except Exception:
+                with self._lock:
+                    if candidate.name in self.stats:
+                        self.stats[candidate.name].errors += 1
+                continue
+            latency_ms = (time.perf_counter() - start) * 1000.0
+
+            with self._lock:
+                if candidate.name in self.stats:
+                    self.stats[candidate.name].record(score, primary_score, latency_ms)
+
+            if self.log_writer is not None:
+                self.log_writer.append({
+                    'timestamp': timestamp,
+                    'transaction_id': str(transaction.get('TransactionID') or ''),
+                    'account_id': str(transaction.get('AccountID') or ''),
+                    'candidate': candidate.name,
+                    'score': score,
+                    'primary_score': float(primary_score),
+                    'latency_ms': latency_ms,
+                })
+
+    def report(self):
+        with self._lock:
+            return {
+                'sample_rate': self.sample_rate,
+                'threshold': self.threshold,
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'queue_depth': self._queue.qsize(),
+                'bins': [float(b) for b in self.bins[:-1]],
+                'primary_histogram': self.primary_histogram.tolist(),
+                'candidates': {name: stats.summary() for name, stats in self.stats.items()},
+            }
@@ -0,0 +1,170 @@
+import atexit
+import glob
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        # os.kill(pid, 0) terminates the process on Windows; rely on file age there
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ColumnarSegmentWriter:
+    """Append-only Parquet segments written by a background thread.
+
+    Records are queued by the caller without blocking and flushed as one
+    row group per batch; a segment is closed and renamed to its final
+    ``.parquet`` name once it holds ``segment_rows`` rows or ``segment_seconds``
+    have passed, so readers only ever see complete files.
+
+    The open segment is closed at interpreter exit. A ``.inprogress`` file left
+    by a process that died is recovered on the next start if its footer was
+    written, otherwise it is set aside as ``.corrupt``; at most one segment
+    interval of rows is lost on a hard crash.
+    """
+
+    def __init__(self, directory, schema, prefix='segment', flush_rows=1000,
+                 flush_interval=2.0, segment_rows=200_000, segment_seconds=3600,
+                 compression='zstd', max_pending=100_000, on_segment_closed=None):
+        self.directory = directory
+        self.schema = schema if isinstance(schema, pa.Schema) else pa.schema(schema)
+        self.prefix = prefix
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.segment_rows = segment_rows
+        self.segment_seconds = segment_seconds
+        self.compression = compression
+        self.on_segment_closed = on_segment_closed
+        self.dropped = 0
+        self.rows_written = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.recovered = self._recover_orphans()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._writer = None
+        self._segment_path = None
+        self._segment_started = 0.0
+        self._segment_row_count = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _is_orphan(self, path):
+        # Names are <prefix>-<timestamp>-<pid>.parquet.inprogress
+        pid = os.path.basename(path).split('.')[0].rsplit('-', 1)[-1]
+        if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+            return True
+        # A live writer closes every segment within segment_seconds of opening it
+        age = time.time() - os.path.getmtime(path)
+        return age > self.segment_seconds + 2 * self.flush_interval + 60
+
+    def _recover_orphans(self):
+        recovered = 0
+        for path in glob.glob(os.path.join(self.directory, f'{self.prefix}-*.parquet.inprogress')):
+            if not self._is_orphan(path):
+                continue
+            final_path = path[:-len('.inprogress')]
+            try:
+                table = pq.read_table(path)
+            except Exception as e:
+                logger.warning(f"Unreadable segment {path} from an unclean shutdown ({e}); moved to .corrupt")
+                os.replace(path, final_path + '.corrupt')
+                continue
+            os.replace(path, final_path)
+            self.on_segment_recovered(final_path, table)
+            recovered += 1
+        return recovered
+
+    def append(self, record):
+        """Queue one record (a dict keyed by column name); never blocks the caller"""
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _drain(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_rows:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set() or not self._queue.empty():
+            batch = self._drain()
+            if batch:
+                self._write_batch(batch)
+            if self._writer is not None and time.monotonic() - self._segment_started >= self.segment_seconds:
+                self._close_segment()
+        self._close_segment()
+
+    def _open_segment(self):
+        name = f"{self.prefix}-{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}.parquet"
+        self._segment_path = os.path.join(self.directory, name)
+        self._writer = pq.ParquetWriter(self._segment_path + '.inprogress', self.schema,
+                                        compression=self.compression)
+        self._segment_started = time.monotonic()
+        self._segment_row_count = 0
+
+    def _write_batch(self, batch):
+        if self._writer is None:
+            self._open_segment()
+        columns = {name: [record.get(name) for record in batch] for name in self.schema.names}
+        table = pa.Table.from_pydict(columns, schema=self.schema)
+        self._writer.write_table(table)
+        self._segment_row_count += len(batch)
+        self.rows_written += len(batch)
+        self.on_batch_written(table)
+        if self._segment_row_count >= self.segment_rows:
+            self._close_segment()
+
+    def on_batch_written(self, table):
+        """Hook for subclasses that index rows as they are written"""
+        pass
+
+    def on_segment_recovered(self, path, table):
+        """Hook for subclasses that index segments recovered at startup"""
+        pass
+
+    def _close_segment(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        os.replace(self._segment_path + '.inprogress', self._segment_path)
+        if self.on_segment_closed is not None:
+            self.on_segment_closed(self._segment_path)
+        self._writer = None
+        self._segment_path = None
+
+    def close(self, timeout=10.0):
+        """Flush queued records and close the open segment"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._thread.join(timeout)
@@ -0,0 +1,337 @@
+import base64
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from serving.entity_lists import BloomFilter, _digest, _digest_array
+from storage.columnar import ColumnarSegmentWriter
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+# A false positive only costs reading one segment that has no rows for the account
+ACCOUNT_FILTER_ERROR_RATE = 0.01
+
+EVENT_SCHEMA = pa.schema([
+    ('TransactionDate', pa.timestamp('us')),
+    ('ScoredAt', pa.timestamp('us')),
+    ('TransactionID', pa.string()),
+    ('AccountID', pa.string()),
+    ('TransactionAmount', pa.float64()),
+    ('TransactionType', pa.string()),
+    ('Location', pa.string()),
+    ('DeviceID', pa.string()),
+    ('MerchantID', pa.string()),
+    ('Channel', pa.string()),
+    ('RiskScore', pa.float64()),
+    ('Status', pa.string()),
+    ('IsolationForestScore', pa.float64()),
+    ('XGBoostProbability', pa.float64()),
+    ('GNNProbability', pa.float64()),
+])
+
+
+class SegmentIndex:
+    """Min/max timestamp, latest scoring time and an account Bloom filter of one closed segment"""
+
+    def __init__(self, path, min_ts, max_ts, rows, accounts, max_scored=None):
+        self.path = path
+        self.min_ts = min_ts
+        self.max_ts = max_ts
+        self.rows = rows
+        self.accounts = accounts
+        self.max_scored = max_scored
+
+    @classmethod
+    def load(cls, index_path):
+        with open(index_path) as f:
+            raw = json.load(f)
+        if 'account_filter' in raw:
+            packed = raw['account_filter']
+            accounts = BloomFilter.from_bits(base64.b64decode(packed['bits']),
+                                             packed['num_bits'], packed['num_hashes'])
+        else:
+            # Indexes written before the filter listed every account ID
+            accounts = account_filter(raw['accounts'])
+        return cls(
+            index_path[:-len('.index.json')],
+            datetime.fromisoformat(raw['min_ts']),
+            datetime.fromisoformat(raw['max_ts']),
+            raw['rows'],
+            accounts,
+            # Indexes written before ScoredAt was tracked cannot be pruned by it
+            datetime.fromisoformat(raw['max_scored']) if raw.get('max_scored') else None,
+        )
+
+    @classmethod
+    def from_table(cls, path, table):
+        dates = pc.min_max(table.column('TransactionDate'))
+        return cls(path, dates['min'].as_py(), dates['max'].as_py(), table.num_rows,
+                   account_filter(pc.unique(table.column('AccountID')).to_pylist()),
+                   pc.max(table.column('ScoredAt')).as_py())
+
+    def save(self):
+        tmp_path = self.path + '.index.json.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'min_ts': self.min_ts.isoformat(),
+                'max_ts': self.max_ts.isoformat(),
+                'rows': self.rows,
+                'account_filter': {
+                    'bits': base64.b64encode(self.accounts.bits).decode('ascii'),
+                    'num_bits': self.accounts.num_bits,
+                    'num_hashes': self.accounts.num_hashes,
+                },
+                'max_scored': self.max_scored.isoformat() if self.max_scored else None,
+            }, f)
+        os.replace(tmp_path, self.path + '.index.json')
+
+    def may_contain(self, start=None, end=None, account_id=None):
+        if start is not None and self.max_ts < start:
+            return False
+        if end is not None and self.min_ts > end:
+            return False
+        if account_id is not None and not self.accounts.contains(*_digest(account_id)):
+            return False
+        return True
+
+
+def account_filter(account_ids):
+    """Bloom filter over a segment's distinct account IDs"""
+    account_ids = [a for a in set(account_ids) if a is not None]
+    return BloomFilter(_digest_array(account_ids), ACCOUNT_FILTER_ERROR_RATE)
+
+
+class ScoredEventLog(ColumnarSegmentWriter):
+    """Append-only log of scored transactions in rolling compressed Parquet segments.
+
+    Every closed segment gets a sidecar index so time-range and per-account
+    reads open only the segments that can match. Rows of the segment still
+    being written are kept in memory until it closes, so queries see them
+    within one flush interval. Segments closed by other worker processes are
+    picked up by re-reading the directory at most every ``refresh_interval``.
+    """
+
+    def __init__(self, directory='data/events', refresh_interval=2.0, **kwargs):
+        kwargs.setdefault('segment_seconds', 300)
+        kwargs.setdefault('segment_rows', 50_000)
+        self._index_lock = threading.Lock()
+        self.directory = directory
+        self.refresh_interval = refresh_interval
+        self.segments = []
+        self._known_paths = set()
+        self._last_refresh = 0.0
+        self._open_tables = []
+        self._open_accounts = set()
+        self._open_min_ts = None
+        self._open_max_ts = None
+        self._open_max_scored = None
+        self._refresh_segments(force=True)
+        super().__init__(directory, EVENT_SCHEMA, prefix='events', **kwargs)
+
+    def _add_segment(self, index):
+        if index.path not in self._known_paths:
+            self._known_paths.add(index.path)
+            self.segments.append(index)
+
+    def _refresh_segments(self, force=False):
+        now = time.monotonic()
+        with self._index_lock:
+            if not force and now - self._last_refresh < self.refresh_interval:
+                return
+            self._last_refresh = now
+            known = set(self._known_paths)
+        loaded = []
+        for index_path in sorted(glob.glob(os.path.join(self.directory, '*.parquet.index.json'))):
+            if index_path[:-len('.index.json')] not in known:
+                try:
+                    loaded.append(SegmentIndex.load(index_path))
+                except (OSError, ValueError):
+                    # Another worker may be mid-rename; pick it up next time
+                    continue
+        with self._index_lock:
+            for index in loaded:
+                self._add_segment(index)
+
+    def on_segment_recovered(self, path, table):
+        if not table.num_rows:
+            return
+        index = SegmentIndex.from_table(path, table)
+        index.save()
+        with self._index_lock:
+            self._add_segment(index)
+
+    def on_batch_written(self, table):
+        timestamps = table.column('TransactionDate')
+        min_max = pc.min_max(timestamps)
+        batch_min = min_max['min'].as_py()
+        batch_max = min_max['max'].as_py()
+        batch_scored = pc.max(table.column('ScoredAt')).as_py()
+        with self._index_lock:
+            self._open_tables.append(table)
+            self._open_accounts.update(table.column('AccountID').to_pylist())
+            if batch_min is not None:
+                self._open_min_ts = batch_min if self._open_min_ts is None else min(self._open_min_ts, batch_min)
+                self._open_max_ts = batch_max if self._open_max_ts is None else max(self._open_max_ts, batch_max)
+            if batch_scored is not None:
+                self._open_max_scored = batch_scored if self._open_max_scored is None \
+                    else max(self._open_max_scored, batch_scored)
+
+    def _close_segment(self):
+        if self._writer is None:
+            return
+        path = self._segment_path
+        rows = self._segment_row_count
+        super()._close_segment()
+        with self._index_lock:
+            if rows and self._open_min_ts is not None:
+                index = SegmentIndex(path, self._open_min_ts, self._open_max_ts, rows,
+                                     account_filter(self._open_accounts), self._open_max_scored)
+                index.save()
+                self._add_segment(index)
+            self._open_tables = []
+            self._open_accounts = set()
+            self._open_min_ts = None
+            self._open_max_ts = None
+            self._open_max_scored = None
+
+    def append_scored(self, transaction, scores, status):
+        self.append({
+            'TransactionDate': _parse_date(transaction.get('TransactionDate')),
+            'ScoredAt': datetime.now(),
+            'TransactionID': str(transaction.get('TransactionID') or ''),
+            'AccountID': str(transaction.get('AccountID') or ''),
+            'TransactionAmount': float(transaction.get('TransactionAmount', 0.0)),
+            'TransactionType': transaction.get('TransactionType'),
+            'Location': transaction.get('Location'),
+            'DeviceID': transaction.get('DeviceID'),
+            'MerchantID': transaction.get('MerchantID'),
+            'Channel': transaction.get('Channel'),
+            'RiskScore': float(scores['composite_score']),
+            'Status': status,
+            # Model scores are None when the cascade settled the transaction early
+            'IsolationForestScore': scores.get('isolation_forest_score'),
+            'XGBoostProbability': scores.get('xgboost_probability'),
+            'GNNProbability': scores.get('gnn_probability'),
+        })
+
+    def _candidates(self, start, end, account_id):
+        self._refresh_segments()
+        with self._index_lock:
+            segments = [s for s in self.segments if s.may_contain(start, end, account_id)]
+            open_tables = list(self._open_tables)
+
+        filters = []
+        if start is not None:
+            filters.append(('TransactionDate', '>=', start))
+        if end is not None:
+            filters.append(('TransactionDate', '<=', end))
+        if account_id is not None:
+            filters.append(('AccountID', '=', account_id))
+
+        tail = None
+        if open_tables:
+            tail = pa.concat_tables(open_tables)
+            mask = None
+            for column, op, value in filters:
+                cond = {'>=': pc.greater_equal, '<=': pc.less_equal, '=': pc.equal}[op](tail.column(column), value)
+                mask = cond if mask is None else pc.and_(mask, cond)
+            if mask is not None:
+                tail = tail.filter(mask)
+        return segments, filters, tail
+
+    def _read(self, start, end, account_id):
+        segments, filters, tail = self._candidates(start, end, account_id)
+        tables = [pq.read_table(s.path, filters=filters or None) for s in segments]
+        if tail is not None:
+            tables.append(tail)
+        if not tables:
+            return EVENT_SCHEMA.empty_table()
+        return pa.concat_tables(tables)
+
+    def query(self, start=None, end=None, account_id=None, min_risk=None, limit=None):
+        """Scored transactions in [start, end] (and for one account), newest first.
+
+        With a ``limit``, segments are read newest-first and reading stops as
+        soon as no remaining segment can hold a row newer than the current
+        ``limit``-th one.
+        """
+        if limit is not None and limit <= 0:
+            return []
+        if limit is None:
+            top = self._read(start, end, account_id)
+            if min_risk is not None and top.num_rows:
+                top = top.filter(pc.greater_equal(top.column('RiskScore'), min_risk))
+            if top.num_rows:
+                top = top.sort_by([('TransactionDate', 'descending')])
+        else:
+            top = self._newest(start, end, account_id, min_risk, limit)
+
+        records = top.to_pylist()
+        for record in records:
+            for key in ('TransactionDate', 'ScoredAt'):
+                if record[key] is not None:
+                    record[key] = record[key].strftime(DATE_FORMAT)
+        return records
+
+    def _newest(self, start, end, account_id, min_risk, limit):
+        segments, filters, tail = self._candidates(start, end, account_id)
+        segments.sort(key=lambda s: s.max_ts, reverse=True)
+        top = EVENT_SCHEMA.empty_table()
+        for item in ([tail] if tail is not None else []) + segments:
+            if isinstance(item, SegmentIndex):
+                if top.num_rows >= limit and item.max_ts < top.column('TransactionDate')[-1].as_py():
+                    break
+                table = pq.read_table(item.path, filters=filters or None)
+            else:
+                table = item
+            if min_risk is not None and table.num_rows:
+                table = table.filter(pc.greater_equal(table.column('RiskScore'), min_risk))
+            if table.num_rows:
+                top = pa.concat_tables([top, table]).sort_by([('TransactionDate', 'descending')]).slice(0, limit)
+        return top
+
+    def scan_scored_since(self, since, columns):
+        """Selected columns of rows scored at or after ``since``, as Python lists"""
+        self._refresh_segments()
+        with self._index_lock:
+            segments = [s for s in self.segments if s.max_scored is None or s.max_scored >= since]
+            open_tables = list(self._open_tables)
+        tables = [pq.read_table(s.path, columns=list(columns), filters=[('ScoredAt', '>=', since)])
+                  for s in segments]
+        tables += [t.select(list(columns)).filter(pc.greater_equal(t.column('ScoredAt'), since))
+                   for t in open_tables]
+        if not tables:
+            return {name: [] for name in columns}
+        table = pa.concat_tables(tables)
+        return {name: table.column(name).to_pylist() for name in columns}
+
+    def summarize(self, start=None, end=None, flag_threshold=0.7, ctr_threshold=10000):
+        """Totals for compliance reporting over a time range"""
+        table = self._read(start, end, None)
+        if not table.num_rows:
+            return {'total': 0, 'flagged': 0, 'ctr_count': 0, 'total_amount': 0.0}
+        risk = table.column('RiskScore')
+        amount = table.column('TransactionAmount')
+        return {
+            'total': table.num_rows,
+            'flagged': pc.sum(pc.cast(pc.greater(risk, flag_threshold), pa.int64())).as_py() or 0,
+            'ctr_count': pc.sum(pc.cast(pc.greater(amount, ctr_threshold), pa.int64())).as_py() or 0,
+            'total_amount': pc.sum(amount).as_py() or 0.0,
+        }
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value
+    if value:
+        try:
+            return datetime.strptime(value, DATE_FORMAT)
+        except ValueError:
+            pass
+    return datetime.now()
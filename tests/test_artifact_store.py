@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('sklearn')
+
+from sklearn.ensemble import IsolationForest  # noqa: E402
+
+from models.artifact_store import (  # noqa: E402
+    ArtifactError,
+    ModelArtifactStore,
+    export_isolation_forest,
+    export_xgboost,
+)
+
+
+def make_data(n_rows=600, n_features=8, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, n_features))
+    y = (X[:, 0] + 0.5 * X[:, 1] + rng.normal(scale=0.5, size=n_rows) > 0.8).astype(int)
+    return X, y
+
+
+@pytest.mark.parametrize('max_features', [1.0, 0.5])
+def test_mmap_isolation_forest_matches_sklearn(tmp_path, max_features):
+    X, _ = make_data()
+    model = IsolationForest(n_estimators=40, max_samples=128, max_features=max_features,
+                            random_state=0).fit(X)
+    export_isolation_forest(model, str(tmp_path))
+
+    served = ModelArtifactStore(str(tmp_path)).load('isolation_forest')
+    X_test, _ = make_data(n_rows=200, seed=1)
+    np.testing.assert_allclose(served.decision_function(X_test), model.decision_function(X_test),
+                               rtol=1e-9, atol=1e-9)
+    np.testing.assert_array_equal(served.predict(X_test), model.predict(X_test))
+
+
+def test_mmap_xgboost_matches_xgboost_with_missing_values(tmp_path):
+    xgboost = pytest.importorskip('xgboost')
+    X, y = make_data()
+    X[::7, 2] = np.nan
+    model = xgboost.XGBClassifier(n_estimators=30, max_depth=4, random_state=0).fit(X, y)
+    export_xgboost(model, str(tmp_path))
+
+    served = ModelArtifactStore(str(tmp_path)).load('xgboost')
+    X_test, _ = make_data(n_rows=200, seed=1)
+    X_test[::3, 0] = np.nan
+    X_test[::5, 2] = np.nan
+    # XGBoost scores in float32, so only agree to float32 precision
+    np.testing.assert_allclose(served.predict_proba(X_test), model.predict_proba(X_test), atol=1e-5)
+
+
+def make_decimal_data(n_rows=5000, n_features=6, seed=0):
+    # Two-decimal amounts are not exactly representable, so float64 and float32 inputs
+    # can fall on different sides of a learned split
+    rng = np.random.default_rng(seed)
+    X = np.round(rng.uniform(0, 5000, size=(n_rows, n_features)), 2)
+    y = (X[:, 0] + X[:, 1] > 5000).astype(int)
+    return X, y
+
+
+def test_mmap_isolation_forest_matches_sklearn_on_decimal_inputs(tmp_path):
+    X, _ = make_decimal_data()
+    model = IsolationForest(n_estimators=50, max_features=0.5, random_state=0).fit(X)
+    export_isolation_forest(model, str(tmp_path))
+
+    served = ModelArtifactStore(str(tmp_path)).load('isolation_forest')
+    np.testing.assert_allclose(served.decision_function(X), model.decision_function(X),
+                               rtol=1e-9, atol=1e-9)
+
+
+def test_mmap_xgboost_matches_xgboost_on_decimal_inputs(tmp_path):
+    xgboost = pytest.importorskip('xgboost')
+    X, y = make_decimal_data()
+    model = xgboost.XGBClassifier(n_estimators=50, max_depth=6, random_state=0).fit(X, y)
+    export_xgboost(model, str(tmp_path))
+
+    served = ModelArtifactStore(str(tmp_path)).load('xgboost')
+    np.testing.assert_allclose(served.predict_proba(X), model.predict_proba(X), atol=1e-5)
+
+
+def test_checksum_mismatch_is_rejected(tmp_path):
+    X, _ = make_data()
+    model = IsolationForest(n_estimators=5, random_state=0).fit(X)
+    manifest = export_isolation_forest(model, str(tmp_path))
+
+    with open(tmp_path / 'isolation_forest' / manifest['version'] / 'threshold.npy', 'r+b') as f:
+        f.seek(-1, 2)
+        f.write(b'\x01')
+    with pytest.raises(ArtifactError, match='Checksum mismatch'):
+        ModelArtifactStore(str(tmp_path)).load('isolation_forest')
@@ -0,0 +1,27 @@
+import time
+
+from serving.degradation import DegradationController
+
+
+def run_requests(controller, count, sleep_ms):
+    for _ in range(count):
+        with controller.request():
+            time.sleep(sleep_ms / 1000.0)
+
+
+def test_each_check_only_sees_requests_since_the_previous_one():
+    restored = []
+    controller = DegradationController(slo_ms=20.0, stages=('shap', 'gnn'), min_samples=3,
+                                       check_interval=0.0, recover_checks=1,
+                                       on_restore=restored.append)
+    run_requests(controller, 3, 30)
+    assert controller.level == 1
+
+    # Under the SLO but above the recovery budget: hold the level
+    run_requests(controller, 3, 15)
+    assert controller.level == 1 and not restored
+
+    # Fast traffic recovers on the next check instead of waiting for the slow samples to age out
+    run_requests(controller, 3, 0)
+    assert controller.level == 0
+    assert restored == ['shap']
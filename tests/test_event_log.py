@@ -0,0 +1,114 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+import json  # noqa: E402
+
+from storage.event_log import EVENT_SCHEMA, ScoredEventLog, SegmentIndex  # noqa: E402
+
+BASE = datetime(2024, 1, 15, 12, 0, 0)
+
+
+def make_log(directory, **kwargs):
+    kwargs.setdefault('flush_interval', 0.05)
+    kwargs.setdefault('refresh_interval', 0.0)
+    return ScoredEventLog(str(directory), **kwargs)
+
+
+def append(log, i, account='AC00001', risk=0.5):
+    log.append_scored({
+        'TransactionID': f'TX{i:06d}',
+        'AccountID': account,
+        'TransactionAmount': 10.0 + i,
+        'TransactionDate': BASE + timedelta(minutes=i),
+    }, {'composite_score': risk}, 'Approved')
+
+
+def test_close_writes_final_segment_and_index(tmp_path):
+    log = make_log(tmp_path)
+    for i in range(3):
+        append(log, i)
+    log.close()
+
+    names = os.listdir(tmp_path)
+    assert not [n for n in names if n.endswith('.inprogress')]
+    assert len([n for n in names if n.endswith('.index.json')]) == 1
+    assert len(make_log(tmp_path).query()) == 3
+
+
+def test_segments_closed_by_another_writer_are_visible(tmp_path):
+    reader = make_log(tmp_path)
+    writer = make_log(tmp_path)
+    append(writer, 1)
+    writer.close()
+
+    assert [r['TransactionID'] for r in reader.query()] == ['TX000001']
+    reader.close()
+
+
+def test_orphaned_segments_are_recovered_or_set_aside(tmp_path):
+    rows = {name: [None] * 2 for name in EVENT_SCHEMA.names}
+    rows.update({
+        'TransactionDate': [BASE, BASE + timedelta(minutes=1)],
+        'ScoredAt': [BASE, BASE],
+        'TransactionID': ['TX1', 'TX2'],
+        'AccountID': ['AC1', 'AC2'],
+        'RiskScore': [0.1, 0.9],
+    })
+    # Footer written but never renamed, e.g. killed between close and rename
+    pq.write_table(pa.Table.from_pydict(rows, schema=EVENT_SCHEMA),
+                   str(tmp_path / 'events-20240115T120000000000-999991.parquet.inprogress'))
+    # Killed mid-write: no footer
+    (tmp_path / 'events-20240115T120000000001-999992.parquet.inprogress').write_bytes(b'PAR1garbage')
+
+    log = make_log(tmp_path)
+    assert log.recovered == 1
+    assert (tmp_path / 'events-20240115T120000000001-999992.parquet.corrupt').exists()
+    assert [r['TransactionID'] for r in log.query(account_id='AC2')] == ['TX2']
+    log.close()
+
+
+def test_limited_query_returns_newest_rows_across_segments(tmp_path):
+    log = make_log(tmp_path, segment_rows=5, flush_rows=5)
+    for i in range(23):
+        append(log, i, risk=i / 23)
+    log.close()
+
+    log = make_log(tmp_path)
+    newest = log.query(limit=4)
+    assert [r['TransactionID'] for r in newest] == ['TX000022', 'TX000021', 'TX000020', 'TX000019']
+    assert [r['TransactionID'] for r in log.query(limit=2, min_risk=0.5)] == ['TX000022', 'TX000021']
+    assert len(log.query()) == 23
+    assert log.query(limit=0) == []
+    log.close()
+
+
+def test_account_pruning_uses_filter_and_reads_old_indexes(tmp_path):
+    log = make_log(tmp_path, segment_rows=4, flush_rows=4)
+    for i in range(40):
+        append(log, i, account=f'AC{i // 4:05d}')
+    log.close()
+
+    log = make_log(tmp_path)
+    assert [r['TransactionID'] for r in log.query(account_id='AC00003')] == [
+        'TX000015', 'TX000014', 'TX000013', 'TX000012']
+    assert sum(s.may_contain(account_id='AC00003') for s in log.segments) == 1
+    assert log.query(account_id='AC99999') == []
+    log.close()
+
+    # Sidecars written before the filter listed the account IDs themselves
+    index_path = sorted(str(p) for p in tmp_path.glob('*.index.json'))[0]
+    with open(index_path) as f:
+        raw = json.load(f)
+    assert 'accounts' not in raw
+    del raw['account_filter']
+    raw['accounts'] = ['AC00000']
+    with open(index_path, 'w') as f:
+        json.dump(raw, f)
+    index = SegmentIndex.load(index_path)
+    assert index.may_contain(account_id='AC00000')
+    assert not index.may_contain(account_id='AC00002')
@@ -0,0 +1,64 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('torch_geometric')
+pd = pytest.importorskip('pandas')
+
+from graph_models.data_loader import TransactionGraphBuilder  # noqa: E402
+from graph_models.gnn_model import FraudGNN  # noqa: E402
+from graph_models.train_gnn import build_graph_from_csv  # noqa: E402
+
+TRANSACTIONS = [
+    # Repeat pairs and an ID shared between an account and a device
+    {'AccountID': 'A1', 'MerchantID': 'M1', 'DeviceID': 'D1'},
+    {'AccountID': 'A1', 'MerchantID': 'M1', 'DeviceID': 'D1'},
+    {'AccountID': 'A2', 'MerchantID': 'M1', 'DeviceID': 'D1'},
+    {'AccountID': 'A2', 'MerchantID': 'M2', 'DeviceID': 'A1'},
+    {'AccountID': 'A3', 'MerchantID': 'M2', 'DeviceID': 'D2'},
+    {'AccountID': 'A1', 'MerchantID': 'M2', 'DeviceID': 'D1'},
+]
+
+
+def served_graph(transactions):
+    builder = TransactionGraphBuilder(initial_capacity=2)
+    for transaction in transactions:
+        builder.add_edges(transaction)
+    return builder
+
+
+def test_repeat_transactions_add_no_edges():
+    builder = served_graph(TRANSACTIONS)
+    data = builder.to_data(0)
+    edges = set(map(tuple, data.edge_index.t().tolist()))
+    assert len(edges) == data.edge_index.size(1) == 2 * len(builder.pairs)
+    assert builder.num_nodes == 3 + 2 + 3
+
+
+def test_served_graph_matches_training_graph(tmp_path):
+    path = tmp_path / 'transactions.csv'
+    pd.DataFrame([{**t, 'TransactionAmount': 10.0, 'AccountBalance': 100.0, 'LoginAttempts': 1}
+                  for t in TRANSACTIONS]).to_csv(path, index=False)
+    trained, _ = build_graph_from_csv(str(path))
+    builder = served_graph(TRANSACTIONS)
+    served = builder.to_data(0)
+
+    # Map serving node ids onto the training graph's per-column categorical ids
+    frame = pd.DataFrame(TRANSACTIONS).astype('category')
+    offsets = {'account': 0, 'merchant': len(frame['AccountID'].cat.categories)}
+    offsets['device'] = offsets['merchant'] + len(frame['MerchantID'].cat.categories)
+    columns = {'account': 'AccountID', 'merchant': 'MerchantID', 'device': 'DeviceID'}
+    to_trained = {
+        node_id: offsets[kind] + list(frame[columns[kind]].cat.categories).index(key)
+        for (kind, key), node_id in builder.node_index.items()
+    }
+
+    served_edges = {(to_trained[a], to_trained[b]) for a, b in served.edge_index.t().tolist()}
+    assert served_edges == set(map(tuple, trained.edge_index.t().tolist()))
+    assert served.edge_index.size(1) == trained.edge_index.size(1)
+
+    model = FraudGNN(num_node_features=3, hidden_channels=8).eval()
+    order = torch.tensor([to_trained[i] for i in range(builder.num_nodes)])
+    with torch.no_grad():
+        served_probs = model.node_probabilities(served.x, served.edge_index)
+        trained_probs = model.node_probabilities(trained.x, trained.edge_index)
+    torch.testing.assert_close(served_probs, trained_probs[order])
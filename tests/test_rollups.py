@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from reporting.rollups import RollupStore
+
+
+def test_future_dated_record_does_not_hide_live_traffic():
+    rollups = RollupStore()
+    now = datetime.now()
+    # A client-dated payload for tomorrow is clamped to the scoring time
+    rollups.record(100.0, 0.9, True, scored_at=now + timedelta(days=1))
+    for _ in range(5):
+        rollups.record(50.0, 0.8, True)
+
+    stats = rollups.stats('1h')
+    assert stats['totals']['count'] == 6
+    assert stats['totals']['flagged'] == 6
+    assert stats['series']['count'][-1] == 6
+
+
+def test_old_records_outside_retention_are_dropped():
+    rollups = RollupStore()
+    now = datetime.now()
+    rollups.record(10.0, 0.2, False)
+    rollups.record(10.0, 0.2, False, scored_at=now - timedelta(days=400))
+
+    assert rollups.stats('30d')['totals']['count'] == 1
+    assert rollups.stats('24h')['totals']['count'] == 1
+
+
+def test_backfill_uses_scoring_time_and_bins_risk_like_the_dashboard():
+    rollups = RollupStore()
+    now = datetime.now()
+    rollups.backfill(
+        [now - timedelta(minutes=5), now - timedelta(hours=3), now - timedelta(days=3), None],
+        [10.0, 20.0, 30.0, 40.0],
+        [0.4, 0.7, 0.71, 0.5],
+        ['Approved', 'Flagged', 'Flagged', 'Approved'],
+    )
+
+    assert rollups.stats('1h')['totals']['count'] == 1
+    assert rollups.stats('24h')['totals']['count'] == 2
+    week = rollups.stats('7d')
+    assert week['totals'] == {'count': 3, 'flagged': 2, 'high_risk': 1, 'amount': 60.0, 'avg_risk': 0.603}
+    # 0.4 is low, 0.7 is medium, 0.71 is high
+    histogram = week['risk_histogram']
+    assert sum(histogram[:4]) == 1 and sum(histogram[4:7]) == 1 and sum(histogram[7:]) == 1
+
+
+def test_unknown_range_is_rejected():
+    with pytest.raises(ValueError, match='24h'):
+        RollupStore().stats('90d')
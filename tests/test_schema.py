@@ -0,0 +1,71 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from serving.schema import FEATURE_NAMES, SchemaError, TransactionSchema
+
+
+def make_payload(**overrides):
+    payload = {
+        'AccountID': 'AC00001',
+        'TransactionAmount': 125.5,
+        'TransactionType': 'Debit',
+        'TransactionDuration': 40,
+        'LoginAttempts': 1,
+        'AccountBalance': 5200.0,
+        'PreviousTransactionDate': '2024-01-10 09:15:00',
+        'Location': 'Boston',
+        'DeviceID': 'D000101',
+        'MerchantID': 'M001',
+        'TransactionDate': '2024-01-15 14:30:00',
+    }
+    payload.update(overrides)
+    return payload
+
+
+def parse(payload):
+    return TransactionSchema(FEATURE_NAMES).parse(payload)
+
+
+def test_valid_payload_is_parsed():
+    parsed = parse(make_payload(LoginAttempts='2', TransactionDate='2024-01-15T14:30:00'))
+    assert parsed['LoginAttempts'] == 2
+    assert parsed['TransactionDate'] == datetime(2024, 1, 15, 14, 30)
+    assert parsed['Channel'] == ''
+
+
+@pytest.mark.parametrize('field, value, message', [
+    ('AccountID', None, 'is required'),
+    ('TransactionAmount', '', 'is required'),
+    ('TransactionAmount', 'lots', 'could not convert'),
+    ('TransactionAmount', True, 'expected a number'),
+    ('AccountID', ['AC00001'], 'expected a string'),
+    ('LoginAttempts', 1.5, 'expected an integer'),
+    ('AccountBalance', float('nan'), 'expected a finite number'),
+    ('TransactionAmount', float('inf'), 'expected a finite number'),
+    ('TransactionAmount', -1, 'must not be negative'),
+    ('TransactionDuration', 0, 'must be greater than zero'),
+    ('PreviousTransactionDate', '2024-13-45 99:00:00', 'timestamp'),
+    ('TransactionDate', 1705329000, 'timestamp'),
+])
+def test_invalid_fields_raise_schema_error(field, value, message):
+    with pytest.raises(SchemaError, match=message) as excinfo:
+        parse(make_payload(**{field: value}))
+    assert excinfo.value.field == field
+
+
+@pytest.mark.parametrize('field', ['TransactionAmount', 'LoginAttempts', 'AccountBalance'])
+def test_integer_too_large_for_float_raises_schema_error(field):
+    # JSON allows arbitrarily long integer literals; float() of one overflows
+    body = json.dumps(make_payload(**{field: 7})).replace(f'"{field}": 7', f'"{field}": {"9" * 400}')
+    payload = json.loads(body)
+    with pytest.raises(SchemaError, match='out of range') as excinfo:
+        parse(payload)
+    assert excinfo.value.field == field
+
+
+def test_non_object_body_is_rejected():
+    with pytest.raises(SchemaError) as excinfo:
+        parse(None)
+    assert excinfo.value.field == 'body'